@@ -16,9 +16,17 @@ import re
 from collections import defaultdict
 from pathlib import Path
 from statistics import pstdev
-from typing import Dict, List
+from typing import Dict, List, Optional
 
-from nirvana_filter import DEFAULT_TECHNIQUES, DEFAULT_WEIGHTS, logic_solve, score_trace
+from logic_cache import DEFAULT_LOGIC_CACHE_PATH, LogicMetricsCache, solve_metrics
+from nirvana_filter import DEFAULT_TECHNIQUES, DEFAULT_WEIGHTS, LogicBudget
+
+try:
+    import sudoku_batch
+except ImportError:  # numpy missing: ensure_metrics solves every level one by one
+    sudoku_batch = None
+
+METRIC_KEYS = ("difficultyScore", "maxTechnique", "singleRatio", "techTier")
 
 
 def load_levels(path: Path) -> List[dict]:
@@ -31,16 +39,17 @@ def load_levels(path: Path) -> List[dict]:
     return json.loads(m.group(1))
 
 
-def ensure_metrics(level: dict) -> None:
-    required = ("difficultyScore", "maxTechnique", "singleRatio", "techTier")
-    if all(k in level for k in required):
+def ensure_metrics(
+    level: dict, budget: Optional[LogicBudget] = None, cache: Optional[LogicMetricsCache] = None
+) -> None:
+    """Fill missing metrics; a solve cut short by `budget` is recorded like an unsolved level."""
+    if all(k in level for k in METRIC_KEYS):
         return
-    lg = logic_solve(level["puzzle"], DEFAULT_TECHNIQUES)
-    if lg["solved"]:
-        score, max_tech, single_ratio, _ = score_trace(lg["trace"], DEFAULT_WEIGHTS)
-        level["difficultyScore"] = int(score)
-        level["maxTechnique"] = max_tech
-        level["singleRatio"] = round(float(single_ratio), 4)
+    metrics = solve_metrics(level["puzzle"], DEFAULT_TECHNIQUES, DEFAULT_WEIGHTS, cache=cache, budget=budget)
+    if metrics.solved:
+        level["difficultyScore"] = int(metrics.score)
+        level["maxTechnique"] = metrics.max_technique
+        level["singleRatio"] = round(float(metrics.single_ratio), 4)
         level["techTier"] = "unknown"
     else:
         level["difficultyScore"] = 999
@@ -49,6 +58,25 @@ def ensure_metrics(level: dict) -> None:
         level["techTier"] = "unknown"
 
 
+def prefill_metrics_batch(levels: List[dict]) -> int:
+    """Fill metrics for singles-only levels in one vectorized pass; the rest go through ensure_metrics."""
+    missing = [lv for lv in levels if not all(k in lv for k in METRIC_KEYS)]
+    if sudoku_batch is None or not missing:
+        return 0
+    grids = sudoku_batch.to_array([lv["puzzle"] for lv in missing])
+    filled = 0
+    for lv, metrics in zip(missing, sudoku_batch.singles_logic_metrics(grids, DEFAULT_TECHNIQUES, DEFAULT_WEIGHTS)):
+        if metrics is None:
+            continue
+        score, max_tech, single_ratio = metrics
+        lv["difficultyScore"] = int(score)
+        lv["maxTechnique"] = max_tech
+        lv["singleRatio"] = round(float(single_ratio), 4)
+        lv["techTier"] = "unknown"
+        filled += 1
+    return filled
+
+
 def clue_count(level: dict) -> int:
     return sum(1 for v in level["puzzle"] if v != 0)
 
@@ -227,11 +255,28 @@ def main() -> int:
     parser.add_argument("--output", default="out_quality")
     parser.add_argument("--spike-threshold", type=int, default=20)
     parser.add_argument("--repeat-window", type=int, default=4)
+    parser.add_argument(
+        "--logic-max-seconds",
+        type=float,
+        default=0.0,
+        help="Wall-clock budget per level when metrics must be computed (0 = unlimited).",
+    )
+    parser.add_argument(
+        "--logic-cache",
+        default=str(DEFAULT_LOGIC_CACHE_PATH),
+        help="SQLite cache of logic metrics; empty string disables it.",
+    )
     args = parser.parse_args()
 
     levels = load_levels(Path(args.input))
+    prefill_metrics_batch(levels)
+    budget = LogicBudget(max_seconds=args.logic_max_seconds) if args.logic_max_seconds > 0 else None
+    cache = LogicMetricsCache(Path(args.logic_cache)) if args.logic_cache else None
     for lv in levels:
-        ensure_metrics(lv)
+        ensure_metrics(lv, budget, cache)
+    if cache is not None:
+        print(f"Logic metrics cache: {cache.summary()}")
+        cache.close()
 
     levels_by_star: Dict[int, List[dict]] = defaultdict(list)
     for lv in levels:
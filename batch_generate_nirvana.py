@@ -3,7 +3,7 @@
 Batch runner for NIRVANA generation:
 - run generate_and_filter_nirvana.py multiple times with different seeds
 - merge results
-- dedupe by puzzle
+- dedupe by puzzle (or by minlex form with --canonical-keys)
 - select top puzzles per clue target
 """
 
@@ -17,6 +17,11 @@ from collections import Counter, defaultdict
 from pathlib import Path
 from typing import Dict, List
 
+from generate_and_filter_nirvana import CHECKPOINT_NAME
+from pool_format import POOL_SUFFIX, write_pool
+from sudoku_canon import puzzle_key
+from unique_cache import DEFAULT_UNIQUE_CACHE_PATH, UniqueCountStore, level_puzzles, prewarm
+
 
 def parse_targets(raw: str) -> Dict[int, int]:
     out: Dict[int, int] = {}
@@ -31,10 +36,6 @@ def parse_targets(raw: str) -> Dict[int, int]:
     return out
 
 
-def puzzle_key(puzzle: List[int]) -> str:
-    return "".join(map(str, puzzle))
-
-
 def run_once(
     run_idx: int,
     seed: int,
@@ -75,7 +76,38 @@ def main() -> int:
         default="generate_and_filter_nirvana.py",
         help="Path to single-run generator script.",
     )
+    parser.add_argument(
+        "--canonical-keys",
+        action="store_true",
+        help="Dedupe by minlex form (isomorphs merge); also passed to each run.",
+    )
+    parser.add_argument(
+        "--canonical-unique-cache",
+        action="store_true",
+        help="Passed to each run; the shared cache is then pre-warmed with the same minlex keys.",
+    )
+    parser.add_argument(
+        "--unique-cache",
+        default="",
+        help=f"Solution count cache shared by all runs, e.g. {DEFAULT_UNIQUE_CACHE_PATH} (off by default).",
+    )
+    parser.add_argument(
+        "--merged-format",
+        choices=["json", "npool"],
+        default="json",
+        help="Format of the merged unique file; npool is the fixed-width binary format of pool_format.py.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reuse runs that already finished and resume interrupted ones from their checkpoints.",
+    )
     args, passthrough = parser.parse_known_args()
+    if args.canonical_keys:
+        passthrough.append("--canonical-keys")
+    if args.canonical_unique_cache:
+        passthrough.append("--canonical-unique-cache")
+    passthrough += ["--unique-cache", args.unique_cache]
 
     targets = parse_targets(args.targets)
     out_dir = Path(args.output)
@@ -85,6 +117,14 @@ def main() -> int:
     script_path = Path(args.generator_script)
     input_path = Path(args.input)
 
+    if args.unique_cache:
+        # Warm once here so the runs do not all count the same puzzles at startup.
+        store = UniqueCountStore(Path(args.unique_cache))
+        earlier_pools = sorted(runs_dir.glob("*/nirvana_stage1_pool.*"))
+        added = prewarm(store, level_puzzles([input_path] + earlier_pools), canonical=args.canonical_unique_cache)
+        store.close()
+        print(f"unique cache: pre-warmed {added} puzzles from {input_path} and {len(earlier_pools)} earlier pools")
+
     run_summaries = []
     merged_by_key: Dict[str, dict] = {}
     reject_counts = Counter()
@@ -94,31 +134,38 @@ def main() -> int:
         seed = args.seed_start + i * args.seed_step
         run_out = runs_dir / f"run_{run_idx:03d}_seed_{seed}"
         run_out.mkdir(parents=True, exist_ok=True)
+        gen_path = run_out / "nirvana_generated_levels.json"
 
-        rc = run_once(
-            run_idx=run_idx,
-            seed=seed,
-            script_path=script_path,
-            input_path=input_path,
-            run_out=run_out,
-            passthrough_args=passthrough,
-        )
+        # A run removes its checkpoint when it finishes, so output without one is complete.
+        if args.resume and gen_path.exists() and not (run_out / CHECKPOINT_NAME).exists():
+            print(f"[run {run_idx}] seed={seed} finished earlier, reusing its output")
+            rc = 0
+        else:
+            rc = run_once(
+                run_idx=run_idx,
+                seed=seed,
+                script_path=script_path,
+                input_path=input_path,
+                run_out=run_out,
+                passthrough_args=passthrough + (["--resume"] if args.resume else []),
+            )
         if rc != 0:
             run_summaries.append({"run": run_idx, "seed": seed, "status": "failed", "generated": 0})
             reject_counts["run_failed"] += 1
             continue
 
-        gen_path = run_out / "nirvana_generated_levels.json"
         if not gen_path.exists():
             run_summaries.append({"run": run_idx, "seed": seed, "status": "missing_output", "generated": 0})
             reject_counts["missing_output"] += 1
             continue
 
         items = json.loads(gen_path.read_text(encoding="utf-8"))
-        run_summaries.append({"run": run_idx, "seed": seed, "status": "ok", "generated": len(items)})
+        run_summaries.append(
+            {"run": run_idx, "seed": seed, "status": "ok", "generated": len(items), "out": str(run_out)}
+        )
 
         for item in items:
-            key = puzzle_key(item["puzzle"])
+            key = puzzle_key(item["puzzle"], args.canonical_keys)
             prev = merged_by_key.get(key)
             if prev is None:
                 merged_by_key[key] = item
@@ -145,11 +192,14 @@ def main() -> int:
         if len(group) < targets[clue]:
             reject_counts[f"insufficient_clue_{clue}"] += targets[clue] - len(group)
 
-    merged_path = out_dir / "nirvana_merged_unique.json"
+    merged_path = out_dir / ("nirvana_merged_unique" + (POOL_SUFFIX if args.merged_format == "npool" else ".json"))
     selected_path = out_dir / "nirvana_merged_selected.json"
     report_path = out_dir / "nirvana_batch_report.md"
 
-    merged_path.write_text(json.dumps(merged, ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.merged_format == "npool":
+        write_pool(merged_path, merged)
+    else:
+        merged_path.write_text(json.dumps(merged, ensure_ascii=False, indent=2), encoding="utf-8")
     selected_path.write_text(json.dumps(selected, ensure_ascii=False, indent=2), encoding="utf-8")
 
     lines = [
@@ -163,6 +213,17 @@ def main() -> int:
     ]
     for x in run_summaries:
         lines.append(f"- run {x['run']} seed={x['seed']} status={x['status']} generated={x['generated']}")
+    if args.unique_cache:
+        store = UniqueCountStore(Path(args.unique_cache))
+        run_stats = store.run_stats([x["out"] for x in run_summaries if "out" in x])
+        lines += ["", "## Uniqueness cache across runs", f"- {store.path}: {len(store)} entries"]
+        for label, hits, misses, stored in run_stats:
+            rate = hits / (hits + misses) if hits + misses else 0.0
+            lines.append(f"- {Path(label).name}: hits={hits} misses={misses} hit_rate={rate:.1%} stored={stored}")
+        total_hits = sum(x[1] for x in run_stats)
+        total = total_hits + sum(x[2] for x in run_stats)
+        lines.append(f"- this batch: hit_rate={total_hits / total if total else 0.0:.1%}")
+        store.close()
     lines += ["", "## Selected by clue"]
     selected_counter = Counter(item["clues"] for item in selected)
     for clue in sorted(targets):
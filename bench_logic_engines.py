@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark the set-based and bitmask logic engines on the same levels.
+
+Every level is solved by both engines; traces must match exactly, and the
+report shows total and per-star wall time for each engine.
+
+Usage:
+  python bench_logic_engines.py --input levels.js
+  python bench_logic_engines.py --input levels.js --stars 8 --repeat 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from collections import Counter
+from pathlib import Path
+
+from nirvana_filter import DEFAULT_TECHNIQUES, DEFAULT_WEIGHTS, LOGIC_ENGINES, load_levels, logic_solve, score_trace
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare logic_solve engines on a level file.")
+    parser.add_argument("--input", default="levels.js", help="Path to levels.js or levels.json")
+    parser.add_argument("--allowed-techniques", default=",".join(DEFAULT_TECHNIQUES))
+    parser.add_argument("--stars", default="", help="Comma-separated star tiers to include (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="Solve each level this many times per engine.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Enable incremental scheduling in the bitmask engine (rescan only what changed).",
+    )
+    args = parser.parse_args()
+
+    allowed = [x.strip() for x in args.allowed_techniques.split(",") if x.strip()]
+    incremental = args.incremental
+    levels = [lv for lv in load_levels(Path(args.input)) if isinstance(lv.get("puzzle"), list)]
+    if args.stars:
+        wanted = {int(x) for x in args.stars.split(",") if x.strip()}
+        levels = [lv for lv in levels if lv.get("stars") in wanted]
+
+    elapsed = {engine: Counter() for engine in LOGIC_ENGINES}
+    mismatches = []
+    if levels:
+        # Warm-up so lazy imports are not charged to the first tier.
+        for engine in LOGIC_ENGINES:
+            logic_solve(levels[0]["puzzle"], allowed, engine=engine, incremental=incremental)
+    for lv in levels:
+        results = {}
+        for engine in LOGIC_ENGINES:
+            t0 = time.perf_counter()
+            for _ in range(max(1, args.repeat)):
+                results[engine] = logic_solve(lv["puzzle"], allowed, engine=engine, incremental=incremental)
+            elapsed[engine][lv.get("stars")] += time.perf_counter() - t0
+        ref = results["set"]
+        for engine in LOGIC_ENGINES:
+            got = results[engine]
+            if got != ref:
+                mismatches.append((lv.get("id"), engine))
+            elif got["solved"]:
+                # Scores are derived from the trace; check them anyway as the user-facing metric.
+                if score_trace(got["trace"], DEFAULT_WEIGHTS) != score_trace(ref["trace"], DEFAULT_WEIGHTS):
+                    mismatches.append((lv.get("id"), engine))
+
+    print(
+        f"levels={len(levels)} repeat={max(1, args.repeat)} incremental={incremental} "
+        f"techniques={','.join(allowed)}"
+    )
+    print("")
+    header = "stars  " + "  ".join(f"{engine:>10}" for engine in LOGIC_ENGINES) + "   speedup"
+    print(header)
+    for stars in sorted(elapsed["set"], key=lambda s: (s is None, s)):
+        row = "  ".join(f"{elapsed[engine][stars]:>9.3f}s" for engine in LOGIC_ENGINES)
+        base = elapsed["set"][stars]
+        fast = elapsed["bitmask"][stars]
+        speedup = base / fast if fast > 0 else 0.0
+        print(f"{str(stars):>5}  {row}   {speedup:>6.2f}x")
+    totals = {engine: sum(elapsed[engine].values()) for engine in LOGIC_ENGINES}
+    row = "  ".join(f"{totals[engine]:>9.3f}s" for engine in LOGIC_ENGINES)
+    speedup = totals["set"] / totals["bitmask"] if totals["bitmask"] > 0 else 0.0
+    print(f"{'total':>5}  {row}   {speedup:>6.2f}x")
+    print("")
+
+    if mismatches:
+        print(f"Trace mismatches: {len(mismatches)}")
+        for lv_id, engine in mismatches[:20]:
+            print(f"- id={lv_id} engine={engine}")
+        return 1
+    print("Trace check: all engines identical.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
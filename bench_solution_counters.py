@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Head-to-head benchmark of count_solutions backends on the 17-clue dataset.
+
+Every puzzle is counted by each backend; counts must agree. The report shows
+total/mean/max wall time and search nodes per backend.
+
+Usage:
+  python bench_solution_counters.py
+  python bench_solution_counters.py --backends dfs,dlx --max-puzzles 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from import_17clue_dataset import parse_puzzle_line
+from nirvana_filter import COUNT_BACKENDS, count_solutions
+from sudoku_solver import SearchStats
+
+
+def load_puzzles(path: Path, max_puzzles: int) -> List[List[int]]:
+    puzzles: List[List[int]] = []
+    with path.open("r", encoding="utf-8") as f:
+        for raw in f:
+            raw = raw.rstrip("\n")
+            if not raw or raw.startswith("#"):
+                continue
+            puzzle = parse_puzzle_line(raw)
+            if puzzle is None:
+                continue
+            puzzles.append(puzzle)
+            if max_puzzles and len(puzzles) >= max_puzzles:
+                break
+    return puzzles
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare count_solutions backends.")
+    parser.add_argument("--input", default="external_data/puzzles2_17_clue.txt")
+    parser.add_argument("--backends", default=",".join(COUNT_BACKENDS), help="Comma-separated backends to compare.")
+    parser.add_argument("--limit", type=int, default=2, help="Solution count limit passed to count_solutions.")
+    parser.add_argument("--max-puzzles", type=int, default=0, help="0 means the whole file")
+    parser.add_argument("--progress-every", type=int, default=5000)
+    args = parser.parse_args()
+
+    backends = [x.strip() for x in args.backends.split(",") if x.strip()]
+    unknown = [x for x in backends if x not in COUNT_BACKENDS]
+    if unknown:
+        raise ValueError(f"Unknown backends: {unknown}")
+
+    puzzles = load_puzzles(Path(args.input), args.max_puzzles)
+    total_time: Dict[str, float] = {b: 0.0 for b in backends}
+    max_time: Dict[str, float] = {b: 0.0 for b in backends}
+    stats: Dict[str, SearchStats] = {b: SearchStats() for b in backends}
+    mismatches = 0
+
+    for n, puzzle in enumerate(puzzles, 1):
+        counts = []
+        for backend in backends:
+            t0 = time.perf_counter()
+            counts.append(count_solutions(puzzle, limit=args.limit, backend=backend, stats=stats[backend]))
+            dt = time.perf_counter() - t0
+            total_time[backend] += dt
+            max_time[backend] = max(max_time[backend], dt)
+        if len(set(counts)) != 1:
+            mismatches += 1
+        if args.progress_every and n % args.progress_every == 0:
+            done = " ".join(f"{b}={total_time[b]:.1f}s" for b in backends)
+            print(f"[{n}/{len(puzzles)}] {done}", flush=True)
+
+    print(f"puzzles={len(puzzles)} limit={args.limit}")
+    print("")
+    print(f"{'backend':>8} {'total':>10} {'mean':>10} {'max':>10} {'nodes':>12} {'nodes/puz':>10}")
+    count = max(1, len(puzzles))
+    for backend in backends:
+        print(
+            f"{backend:>8} {total_time[backend]:>9.2f}s {total_time[backend] / count * 1000:>8.2f}ms "
+            f"{max_time[backend] * 1000:>8.1f}ms {stats[backend].nodes:>12} {stats[backend].nodes / count:>10.1f}"
+        )
+    print("")
+    if mismatches:
+        print(f"Count mismatches: {mismatches}")
+        return 1
+    print("Count check: all backends agree.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Multiply verified puzzles by emitting random isomorphs of them.
+
+Uniqueness and the clue count do not change under the Sudoku symmetry
+group, so each output puzzle gets the transformed solution with no dig or
+uniqueness check. The logic metrics do change: the technique cascade
+applies the first hit in scan order, so a relabelled or permuted grid can
+take another path. Every output is therefore re-scored with its own
+logic_solve (cached via --logic-cache), which is cheap next to digging,
+and isomorphs of scored sources must pass --min-score / --max-single-ratio
+again (same defaults as the generator and nirvana_filter). Sources without
+a score (e.g. a raw .txt dataset) were never filtered, so neither are their
+isomorphs.
+Sources are deduped by minlex form (isomorphic sources would only give
+overlapping families), and output puzzles are distinct from each other,
+from the sources and from the existing levels.
+
+Sources without a stored solution (e.g. the imported 17-clue dataset) are
+solved once, not once per isomorph.
+
+Example:
+  python expand_isomorphs.py \
+    --input out_nirvana_gen/nirvana_generated_levels.json \
+    --per-puzzle 20 \
+    --output out_nirvana_iso \
+    --seed 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+from import_17clue_dataset import parse_puzzle_line
+from logic_cache import DEFAULT_LOGIC_CACHE_PATH, LogicMetricsCache, solve_metrics
+from nirvana_filter import DEFAULT_TECHNIQUES, DEFAULT_WEIGHTS, count_clues, load_levels
+from sudoku_canon import canonical_key, puzzle_key, random_transform, transform
+from sudoku_solver import search as solver_search
+
+
+# The only source field that survives any isomorphism (besides the transformed solution).
+COPIED_FIELDS = ("clues",)
+
+
+def load_sources(path: Path) -> List[dict]:
+    """Levels from a .js/.json file, or one puzzle per line from a .txt dataset."""
+    if path.suffix.lower() != ".txt":
+        return load_levels(path)
+    out = []
+    with path.open("r", encoding="utf-8") as f:
+        for raw in f:
+            puzzle = parse_puzzle_line(raw) if not raw.startswith("#") else None
+            if puzzle is not None:
+                out.append({"puzzle": puzzle, "clues": count_clues(puzzle), "source": str(path)})
+    return out
+
+
+def source_score(level: dict) -> Optional[int]:
+    """The source's stored score: generator output uses difficulty_score, levels.js difficultyScore."""
+    score = level.get("difficulty_score", level.get("difficultyScore"))
+    return score if isinstance(score, int) else None
+
+
+def source_solution(level: dict, rejects: Counter) -> Optional[List[int]]:
+    solution = level.get("solution")
+    if isinstance(solution, list) and len(solution) == 81:
+        return solution
+    search = solver_search(level["puzzle"], limit=2)
+    if search.count != 1:
+        rejects["source_not_unique"] += 1
+        return None
+    return search.solution
+
+
+def make_report(
+    sources: int,
+    families: int,
+    generated: List[dict],
+    rejects: Counter,
+    per_puzzle: int,
+    score_changed: int,
+) -> str:
+    by_clue = Counter(count_clues(item["puzzle"]) for item in generated)
+    lines = ["# Isomorph Expansion Report", ""]
+    lines.append(f"- sources read: {sources}")
+    lines.append(f"- distinct sources (minlex): {families}")
+    lines.append(f"- isomorphs per source: {per_puzzle}")
+    lines.append(f"- total generated: {len(generated)}")
+    lines.append(f"- re-scored differently from their source: {score_changed}")
+    lines += ["", "## By clue count"]
+    for clue in sorted(by_clue):
+        lines.append(f"- clues {clue}: {by_clue[clue]}")
+    lines += ["", "## Reject reasons"]
+    if rejects:
+        for reason, count in rejects.most_common():
+            lines.append(f"- {reason}: {count}")
+    else:
+        lines.append("- (none)")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Emit random isomorphs of verified puzzles.")
+    parser.add_argument(
+        "--input",
+        nargs="+",
+        default=["out_nirvana_gen/nirvana_generated_levels.json"],
+        help="Generated levels, a stage1 pool (.json), levels.js or a 17-clue .txt dataset.",
+    )
+    parser.add_argument("--existing", default="levels.js", help="Existing levels for id baseline and dedupe.")
+    parser.add_argument("--output", default="out_nirvana_iso", help="Output directory.")
+    parser.add_argument("--per-puzzle", type=int, default=10, help="Isomorphs to emit per distinct source.")
+    parser.add_argument("--max-total", type=int, default=0, help="Stop after this many outputs (0 = no cap).")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--difficulty-name", default="NIRVANA 寂滅", help="Used when a source has none.")
+    parser.add_argument("--stars", type=int, default=5, help="Used when a source has none.")
+    parser.add_argument("--allowed-techniques", default=",".join(DEFAULT_TECHNIQUES))
+    parser.add_argument("--min-score", type=int, default=35, help="Applied to isomorphs of scored sources.")
+    parser.add_argument(
+        "--max-single-ratio", type=float, default=0.65, help="Applied to isomorphs of scored sources."
+    )
+    parser.add_argument(
+        "--logic-cache",
+        default=str(DEFAULT_LOGIC_CACHE_PATH),
+        help="SQLite cache of logic metrics; empty string disables it.",
+    )
+    args = parser.parse_args()
+
+    allowed = [x.strip() for x in args.allowed_techniques.split(",") if x.strip()]
+    logic_cache = LogicMetricsCache(Path(args.logic_cache)) if args.logic_cache else None
+
+    rng = random.Random(args.seed)
+    existing = load_levels(Path(args.existing))
+    next_id = max((lv.get("id", 0) for lv in existing), default=0) + 1
+    seen = {puzzle_key(lv["puzzle"]) for lv in existing if isinstance(lv.get("puzzle"), list)}
+
+    sources: List[dict] = []
+    for raw_path in args.input:
+        sources.extend(lv for lv in load_sources(Path(raw_path)) if len(lv.get("puzzle") or []) == 81)
+    seen.update(puzzle_key(lv["puzzle"]) for lv in sources)
+
+    generated: List[dict] = []
+    rejects: Counter = Counter()
+    families: set[str] = set()
+    score_changed = 0
+    for level in sources:
+        if args.max_total and len(generated) >= args.max_total:
+            break
+        key = canonical_key(level["puzzle"])
+        if key in families:
+            rejects["source_duplicate_isomorph"] += 1
+            continue
+        families.add(key)
+        solution = source_solution(level, rejects)
+        if solution is None:
+            continue
+        old_score = source_score(level)
+
+        emitted = 0
+        # Puzzles with automorphisms map several transforms to one grid; give up after enough repeats.
+        for _ in range(args.per_puzzle * 20):
+            if emitted >= args.per_puzzle or (args.max_total and len(generated) >= args.max_total):
+                break
+            t = random_transform(rng)
+            puzzle = transform(level["puzzle"], t)
+            raw = puzzle_key(puzzle)
+            if raw in seen:
+                rejects["isomorph_repeat"] += 1
+                continue
+            seen.add(raw)
+            metrics = solve_metrics(puzzle, allowed, DEFAULT_WEIGHTS, cache=logic_cache)
+            if old_score is not None:
+                if not metrics.solved:
+                    rejects["isomorph_not_logic_solvable"] += 1
+                    continue
+                if metrics.score < args.min_score:
+                    rejects["isomorph_low_score"] += 1
+                    continue
+                if metrics.single_ratio > args.max_single_ratio:
+                    rejects["isomorph_too_many_singles"] += 1
+                    continue
+            emitted += 1
+            item = {
+                "id": next_id,
+                "stars": level.get("stars", args.stars),
+                "difficultyName": level.get("difficultyName", args.difficulty_name),
+                "displayName": f"{level.get('displayName', 'Isomorph')} ~{emitted}",
+                "puzzle": puzzle,
+                "solution": transform(solution, t),
+            }
+            item.update((f, level[f]) for f in COPIED_FIELDS if f in level)
+            if metrics.solved:
+                item["difficulty_score"] = metrics.score
+                item["max_technique"] = metrics.max_technique
+                item["single_ratio"] = round(metrics.single_ratio, 4)
+                item["technique_counts"] = dict(sorted(metrics.technique_counts.items()))
+                if old_score is not None and metrics.score != old_score:
+                    score_changed += 1
+            item["isomorph_of"] = level.get("id")
+            item["canonical_key"] = key
+            generated.append(item)
+            next_id += 1
+        if emitted < args.per_puzzle:
+            rejects["source_short_of_isomorphs"] += 1
+
+    out_dir = Path(args.output)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    gen_path = out_dir / "nirvana_isomorph_levels.json"
+    report_path = out_dir / "nirvana_isomorph_report.md"
+    gen_path.write_text(json.dumps(generated, ensure_ascii=False, indent=2), encoding="utf-8")
+    report_path.write_text(
+        make_report(len(sources), len(families), generated, rejects, args.per_puzzle, score_changed),
+        encoding="utf-8",
+    )
+    if logic_cache is not None:
+        logic_cache.close()
+
+    print(f"Done. generated={len(generated)} from {len(families)} distinct sources")
+    print(f"- {gen_path}")
+    print(f"- {report_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -21,42 +21,125 @@ from __future__ import annotations
 import argparse
 import json
 import random
-from collections import Counter, defaultdict
+import sys
+import time
+from collections import Counter, OrderedDict, defaultdict
 from pathlib import Path
-from typing import Dict, List, Sequence, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
+from logic_cache import DEFAULT_LOGIC_CACHE_PATH, LogicMetricsCache, solve_metrics
+from pool_format import POOL_SUFFIX, write_pool
 from nirvana_filter import (
+    BUDGET_EXPENSIVE,
+    BUDGET_SECONDS,
+    BUDGET_STOP,
+    COUNT_BACKENDS,
+    DEFAULT_BACKEND,
     DEFAULT_TECHNIQUES,
     DEFAULT_WEIGHTS,
+    JsonlWriter,
+    LogicBudget,
     count_solutions,
     load_levels,
-    logic_solve,
-    score_trace,
+    single_ratio_stop,
+    singles_prefilter,
 )
+from sudoku_canon import PACKED_SIZE, minlex, pack_puzzle, puzzle_key
+from sudoku_solver import NOT_UNIQUE, UNIQUE, UNKNOWN, SearchBudget
+from sudoku_solver import search as solver_search
+from unique_cache import DEFAULT_UNIQUE_CACHE_PATH, UniqueCountStore, level_puzzles, prewarm
 
 
 class UniqueCounterCache:
-    def __init__(self) -> None:
-        self._cache: Dict[str, int] = {}
+    def __init__(
+        self,
+        backend: str = DEFAULT_BACKEND,
+        budget: Optional[SearchBudget] = None,
+        canonical: bool = False,
+        store: Optional[UniqueCountStore] = None,
+        max_entries: int = 0,
+    ) -> None:
+        self.backend = backend
+        self.budget = budget
+        # Persistent layer behind the dict, shared with other runs.
+        self.store = store
+        # Minlex keys: isomorphs have the same solution count, so they share one
+        # entry. Costs a minlex per lookup, far more than most dig probe solves.
+        self.canonical = canonical
+        # LRU over packed 41-byte keys; max_entries=0 never evicts. Budget-aborted
+        # (None) counts are not kept: the node count differs per isomorph.
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self.max_entries = max_entries
         self.hits = 0
         self.misses = 0
+        self.unknown = 0
+        self.evictions = 0
+        self.peak_size = 0
 
-    @staticmethod
-    def _key(puzzle: Sequence[int]) -> str:
-        return "".join(map(str, puzzle))
-
-    def count(self, puzzle: Sequence[int], limit: int = 2) -> int:
-        key = self._key(puzzle)
+    def _remember(self, key: bytes, value: int) -> None:
+        self._cache[key] = value
+        if self.max_entries and len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+        if len(self._cache) > self.peak_size:
+            self.peak_size = len(self._cache)
+
+    def memory_bytes(self) -> int:
+        """Approximate size of the in-memory cache: table plus packed keys (values are shared small ints)."""
+        return sys.getsizeof(self._cache) + len(self._cache) * sys.getsizeof(bytes(PACKED_SIZE))
+
+    def count(self, puzzle: Sequence[int], limit: int = 2) -> Optional[int]:
+        """Solution count capped at `limit`, or None when the search budget ran out."""
+        grid = minlex(puzzle) if self.canonical else puzzle
+        key = pack_puzzle(grid)
         if key in self._cache:
             self.hits += 1
+            self._cache.move_to_end(key)
             return self._cache[key]
+        if self.store is not None:
+            value = self.store.get(puzzle_key(grid), limit)
+            if value is not None:
+                self.hits += 1
+                self._remember(key, value)
+                return value
         self.misses += 1
-        value = count_solutions(puzzle, limit=limit)
-        self._cache[key] = value
+        value = count_solutions(puzzle, limit=limit, backend=self.backend, budget=self.budget)
+        if value is None:
+            self.unknown += 1
+            return None
+        if self.store is not None:
+            self.store.put(puzzle_key(grid), value, limit)
+        self._remember(key, value)
         return value
 
+    def uniqueness(self, puzzle: Sequence[int]) -> str:
+        value = self.count(puzzle, limit=2)
+        if value is None:
+            return UNKNOWN
+        return UNIQUE if value == 1 else NOT_UNIQUE
+
     def is_unique(self, puzzle: Sequence[int]) -> bool:
-        return self.count(puzzle, limit=2) == 1
+        return self.uniqueness(puzzle) == UNIQUE
+
+
+def probe_removable(
+    puzzle: List[int],
+    cells: Sequence[int],
+    unique_cache: UniqueCounterCache,
+    rejects: Optional[Counter] = None,
+) -> List[int]:
+    """Cells whose removal keeps the puzzle unique; an unknown result counts as not removable."""
+    removable: List[int] = []
+    for idx in cells:
+        saved = puzzle[idx]
+        puzzle[idx] = 0
+        state = unique_cache.uniqueness(puzzle)
+        puzzle[idx] = saved
+        if state == UNIQUE:
+            removable.append(idx)
+        elif state == UNKNOWN and rejects is not None:
+            rejects["stage1_probe_budget_exhausted"] += 1
+    return removable
 
 
 def parse_targets(raw: str) -> Dict[int, int]:
@@ -140,6 +223,7 @@ def dig_backtracking(
     branch_limit: int,
     probe_limit: int,
     nodes_left: List[int],
+    rejects: Optional[Counter] = None,
 ) -> List[int] | None:
     if clues == target_clues:
         return puzzle[:]
@@ -151,13 +235,7 @@ def dig_backtracking(
 
     filled = [i for i, v in enumerate(puzzle) if v != 0]
     rng.shuffle(filled)
-    removable: List[int] = []
-    for idx in filled[:probe_limit]:
-        saved = puzzle[idx]
-        puzzle[idx] = 0
-        if unique_cache.is_unique(puzzle):
-            removable.append(idx)
-        puzzle[idx] = saved
+    removable = probe_removable(puzzle, filled[:probe_limit], unique_cache, rejects)
 
     if not removable:
         return None
@@ -175,6 +253,7 @@ def dig_backtracking(
             branch_limit=branch_limit,
             probe_limit=probe_limit,
             nodes_left=nodes_left,
+            rejects=rejects,
         )
         puzzle[idx] = saved
         if found is not None:
@@ -193,6 +272,7 @@ def dig_unique_puzzle_two_stage(
     bridge_floor: int = 24,
     backtrack_branch_limit: int = 8,
     backtrack_node_limit: int = 6000,
+    rejects: Optional[Counter] = None,
 ) -> List[int] | None:
     # Two-stage digging:
     # 1) greedy down to a bridge clue count
@@ -204,13 +284,7 @@ def dig_unique_puzzle_two_stage(
         while clues > bridge_clues:
             filled = [i for i, v in enumerate(puzzle) if v != 0]
             rng.shuffle(filled)
-            removable: List[int] = []
-            for idx in filled[:probe_limit]:
-                saved = puzzle[idx]
-                puzzle[idx] = 0
-                if unique_cache.is_unique(puzzle):
-                    removable.append(idx)
-                puzzle[idx] = saved
+            removable = probe_removable(puzzle, filled[:probe_limit], unique_cache, rejects)
             if not removable:
                 break
             remove_idx = rng.choice(removable)
@@ -229,12 +303,65 @@ def dig_unique_puzzle_two_stage(
                 branch_limit=backtrack_branch_limit,
                 probe_limit=probe_limit,
                 nodes_left=nodes_left,
+                rejects=rejects,
             )
             if found is not None:
                 return found
     return None
 
 
+CHECKPOINT_NAME = "nirvana_checkpoint.json"
+# Options that may change between an interrupted run and its --resume: they do not affect results.
+# --unique-cache and --prewarm are not among them: with a node budget, a stored count can answer a
+# probe that this run's own search would leave UNKNOWN, which changes which digs are accepted. Even
+# with the same options the store can change under a run, see resume_is_exact().
+RESUME_FREE_OPTIONS = {
+    "resume",
+    "checkpoint_interval",
+    "unique_cache_max_entries",
+    "logic_cache",
+}
+
+
+def resume_is_exact(args: argparse.Namespace) -> bool:
+    """
+    True when a resumed run ends exactly like an uninterrupted one. Wall-clock
+    budgets never repeat exactly, and with a node budget the shared
+    --unique-cache store (which earlier or concurrent runs keep writing to)
+    can answer probes this run's own search would leave UNKNOWN.
+    """
+    if args.unique_max_seconds > 0 or args.logic_max_seconds > 0:
+        return False
+    return not args.unique_cache or args.unique_max_nodes <= 0
+
+
+def rng_state_to_json(state: tuple) -> list:
+    version, internal, gauss_next = state
+    return [version, list(internal), gauss_next]
+
+
+def rng_state_from_json(data: list) -> tuple:
+    return (data[0], tuple(data[1]), data[2])
+
+
+def save_checkpoint(path: Path, state: dict) -> None:
+    """Write via a temp file so an interruption never leaves a half-written checkpoint."""
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    tmp.replace(path)
+
+
+def load_checkpoint(path: Path, args: argparse.Namespace) -> Optional[dict]:
+    if not path.exists():
+        return None
+    state = json.loads(path.read_text(encoding="utf-8"))
+    options = {k: v for k, v in vars(args).items() if k not in RESUME_FREE_OPTIONS}
+    changed = sorted(k for k, v in options.items() if state["options"].get(k) != v)
+    if changed:
+        raise ValueError(f"--resume: {path} was written with different options: {', '.join(changed)}")
+    return state
+
+
 def make_report(
     targets: Dict[int, int],
     generated: List[dict],
@@ -243,6 +370,9 @@ def make_report(
     stage2_evaluated: Dict[int, int],
     rejects: Counter,
     unique_cache: UniqueCounterCache,
+    stage2_prefiltered: Optional[Dict[int, int]] = None,
+    logic_budget: Optional[LogicBudget] = None,
+    logic_cache: Optional[LogicMetricsCache] = None,
 ) -> str:
     by_clue = Counter(item["clues"] for item in generated)
     lines = [
@@ -259,7 +389,17 @@ def make_report(
         )
     lines += ["", "## Stage 2 (logic scoring)"]
     for clue in sorted(targets):
-        lines.append(f"- clues {clue}: evaluated {stage2_evaluated.get(clue, 0)}")
+        line = f"- clues {clue}: evaluated {stage2_evaluated.get(clue, 0)}"
+        if stage2_prefiltered is not None:
+            line += f" (singles pre-filter rejected {stage2_prefiltered.get(clue, 0)})"
+        lines.append(line)
+    if logic_cache is not None:
+        lines.append(f"- logic metrics cache: {logic_cache.summary()}")
+    if logic_budget is not None and (logic_budget.max_seconds > 0 or logic_budget.max_expensive > 0):
+        lines.append(
+            f"- logic budget: max_seconds={logic_budget.max_seconds:g} "
+            f"max_expensive={logic_budget.max_expensive} ({','.join(logic_budget.expensive)})"
+        )
     lines += ["", "## Final result"]
     for clue in sorted(targets):
         lines.append(
@@ -267,9 +407,23 @@ def make_report(
         )
     lines.append(f"- total generated: {len(generated)}")
     lines += ["", "## Uniqueness cache"]
-    lines.append(f"- cache size: {len(unique_cache._cache)}")
-    lines.append(f"- cache hits: {unique_cache.hits}")
+    lines.append(f"- backend: {unique_cache.backend}")
+    lines.append(f"- keys: {'minlex (isomorphs share entries)' if unique_cache.canonical else 'raw puzzle'}")
+    budget = unique_cache.budget
+    if budget is not None and (budget.max_nodes > 0 or budget.max_seconds > 0):
+        lines.append(f"- budget: max_nodes={budget.max_nodes} max_seconds={budget.max_seconds:g}")
+        lines.append(f"- unknown (budget exhausted): {unique_cache.unknown}")
+    lines.append(f"- cache size: {len(unique_cache._cache)} (peak {unique_cache.peak_size})")
+    lines.append(f"- cache cap: {unique_cache.max_entries or 'unbounded'}")
+    lines.append(f"- cache hits (memory or persistent): {unique_cache.hits}")
     lines.append(f"- cache misses: {unique_cache.misses}")
+    lines.append(f"- cache evictions: {unique_cache.evictions}")
+    lines.append(f"- cache memory: ~{unique_cache.memory_bytes() / 2**20:.1f} MiB")
+    if unique_cache.store is not None:
+        lines.append(f"- persistent cache ({unique_cache.store.path}): {unique_cache.store.summary()}")
+        runs, hits, misses = unique_cache.store.run_totals()
+        if hits + misses:
+            lines.append(f"- persistent cache, {runs} earlier runs: hit_rate={hits / (hits + misses):.1%}")
     lines += ["", "## Reject reasons"]
     if rejects:
         for reason, count in rejects.most_common():
@@ -295,10 +449,22 @@ def collect_unique_pool_for_clue(
     dig_bridge_floor: int,
     dig_backtrack_branch_limit: int,
     dig_backtrack_node_limit: int,
+    canonical_keys: bool = False,
+    on_entry: Optional[Callable[[dict], None]] = None,
+    start_pool: Optional[List[dict]] = None,
+    start_attempts: int = 0,
+    on_attempt: Optional[Callable[[int, List[dict]], None]] = None,
 ) -> Tuple[List[dict], int]:
-    attempts = 0
-    pool: List[dict] = []
+    """
+    Dig puzzles until `target_pool` unique ones are found. A resumed run passes
+    the checkpointed pool and attempt count; `on_attempt` sees the state
+    between attempts, where a checkpoint can be taken.
+    """
+    attempts = start_attempts
+    pool: List[dict] = [] if start_pool is None else start_pool
     while len(pool) < target_pool and attempts < max_attempts:
+        if on_attempt is not None:
+            on_attempt(attempts, pool)
         attempts += 1
         rng = rngs[(attempts - 1) % len(rngs)]
         solution = shuffled_solution(rng)
@@ -313,22 +479,33 @@ def collect_unique_pool_for_clue(
             bridge_floor=dig_bridge_floor,
             backtrack_branch_limit=dig_backtrack_branch_limit,
             backtrack_node_limit=dig_backtrack_node_limit,
+            rejects=rejects,
         )
         if puzzle is None:
             rejects["stage1_dig_failed"] += 1
             continue
-        key = "".join(map(str, puzzle))
+        key = puzzle_key(puzzle, canonical_keys)
         if key in existing_keys:
             rejects["stage1_duplicate_existing"] += 1
             continue
         if key in seen_keys:
             rejects["stage1_duplicate_generated"] += 1
             continue
-        if not unique_cache.is_unique(puzzle):
+        # Final check in one pass: uniqueness, solution and search nodes.
+        search = solver_search(puzzle, limit=2, backend=unique_cache.backend)
+        if search.count != 1:
             rejects["stage1_not_unique"] += 1
             continue
         seen_keys.add(key)
-        pool.append({"clues": clue, "puzzle": puzzle, "solution": solution})
+        entry = {
+            "clues": clue,
+            "puzzle": puzzle,
+            "solution": search.solution,
+            "search_nodes": search.nodes,
+        }
+        pool.append(entry)
+        if on_entry is not None:
+            on_entry(entry)
     return pool, attempts
 
 
@@ -344,6 +521,11 @@ def main() -> int:
     parser.add_argument("--pool-min-per-clue", type=int, default=30, help="Minimum stage1 pool per clue target.")
     parser.add_argument("--stage1-max-attempts-per-clue", type=int, default=120000)
     parser.add_argument("--shuffle-stage2", action="store_true", help="Shuffle stage2 evaluation order.")
+    parser.add_argument(
+        "--no-singles-prefilter",
+        action="store_true",
+        help="Run the full logic_solve on every stage2 board instead of settling singles-only boards first.",
+    )
     parser.add_argument("--dig-restarts", type=int, default=5, help="How many restart tries per dig attempt.")
     parser.add_argument(
         "--dig-probe-limit",
@@ -355,6 +537,97 @@ def main() -> int:
     parser.add_argument("--dig-bridge-floor", type=int, default=24, help="Minimum bridge clue count before backtracking.")
     parser.add_argument("--dig-backtrack-branch-limit", type=int, default=8, help="Max branch width in backtracking.")
     parser.add_argument("--dig-backtrack-node-limit", type=int, default=6000, help="Max recursion nodes per dig attempt.")
+    parser.add_argument(
+        "--unique-backend",
+        default=DEFAULT_BACKEND,
+        choices=COUNT_BACKENDS,
+        help="count_solutions backend used by the uniqueness cache.",
+    )
+    parser.add_argument(
+        "--unique-max-nodes",
+        type=int,
+        default=20000,
+        help="Search node budget per uniqueness probe; over budget = not removable (0 = unlimited).",
+    )
+    parser.add_argument(
+        "--unique-max-seconds",
+        type=float,
+        default=0.0,
+        help="Wall-clock budget per uniqueness probe in seconds (0 = unlimited, not deterministic).",
+    )
+    parser.add_argument(
+        "--canonical-keys",
+        action="store_true",
+        help="Dedupe by minlex form, so isomorphs count as one puzzle (metrics are still per puzzle).",
+    )
+    parser.add_argument(
+        "--canonical-unique-cache",
+        action="store_true",
+        help="Also key the uniqueness cache by minlex form (slow: one minlex per dig probe).",
+    )
+    parser.add_argument(
+        "--unique-cache-max-entries",
+        type=int,
+        default=1_000_000,
+        help="In-memory uniqueness cache cap, least recently used evicted first (0 = unbounded, ~230 bytes/entry).",
+    )
+    parser.add_argument(
+        "--unique-cache",
+        default="",
+        help=(
+            f"SQLite cache of solution counts shared across runs, e.g. {DEFAULT_UNIQUE_CACHE_PATH} "
+            "(off by default: fresh dig states rarely repeat across runs, so its lookups usually cost more "
+            "than they save)."
+        ),
+    )
+    parser.add_argument(
+        "--prewarm",
+        nargs="*",
+        default=[],
+        help="Extra level/pool .json files to count into the uniqueness cache before digging (--input always is).",
+    )
+    parser.add_argument(
+        "--logic-cache",
+        default=str(DEFAULT_LOGIC_CACHE_PATH),
+        help="SQLite cache of stage2 logic metrics; empty string disables it.",
+    )
+    parser.add_argument(
+        "--logic-max-seconds",
+        type=float,
+        default=0.0,
+        help="Wall-clock budget per stage2 logic_solve in seconds (0 = unlimited, not deterministic).",
+    )
+    parser.add_argument(
+        "--logic-max-expensive",
+        type=int,
+        default=0,
+        help="Max aic invocations per stage2 logic_solve; over budget = rejected (0 = unlimited).",
+    )
+    parser.add_argument(
+        "--pool-format",
+        choices=["json", "npool"],
+        default="json",
+        help="Stage1 pool file format; npool is the fixed-width binary format of pool_format.py.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Append stage1 pool entries and stage2 passes/rejects to .jsonl files as they are produced.",
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=float,
+        default=300.0,
+        help="Seconds between checkpoints of RNG state, pool and stage2 progress (0 = never).",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Continue from the checkpoint in --output (same options required); starts fresh if there is none. "
+            "Exact unless a wall-clock budget is set or --unique-cache is used with a node budget."
+        ),
+    )
     parser.add_argument("--seed", type=int, default=None)
     parser.add_argument(
         "--seed-list",
@@ -377,7 +650,7 @@ def main() -> int:
     existing = load_levels(Path(args.input))
     max_id = max((lv.get("id", 0) for lv in existing), default=0)
     existing_puzzles = {
-        "".join(map(str, lv.get("puzzle", [])))
+        puzzle_key(lv["puzzle"], args.canonical_keys)
         for lv in existing
         if isinstance(lv.get("puzzle"), list) and len(lv["puzzle"]) == 81
     }
@@ -387,13 +660,91 @@ def main() -> int:
     stage1_attempts: Dict[int, int] = defaultdict(int)
     stage1_pool_counts: Dict[int, int] = defaultdict(int)
     stage2_evaluated: Dict[int, int] = defaultdict(int)
+    stage2_prefiltered: Dict[int, int] = defaultdict(int)
     next_id = max_id + 1
     seen_generated_keys: set[str] = set()
     unique_pool: List[dict] = []
-    unique_cache = UniqueCounterCache()
+    logic_cache = LogicMetricsCache(Path(args.logic_cache)) if args.logic_cache else None
+    unique_store = UniqueCountStore(Path(args.unique_cache)) if args.unique_cache else None
+    if unique_store is not None:
+        prewarm_paths = [Path(args.input)] + [Path(p) for p in args.prewarm]
+        prewarm(unique_store, level_puzzles(prewarm_paths), args.unique_backend, args.canonical_unique_cache)
+    unique_cache = UniqueCounterCache(
+        backend=args.unique_backend,
+        budget=SearchBudget(max_nodes=args.unique_max_nodes, max_seconds=args.unique_max_seconds),
+        canonical=args.canonical_unique_cache,
+        store=unique_store,
+        max_entries=args.unique_cache_max_entries,
+    )
+
+    out_dir = Path(args.output)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint_path = out_dir / CHECKPOINT_NAME
+    ckpt = load_checkpoint(checkpoint_path, args) if args.resume else None
+    if ckpt is not None and not ckpt.get("exact_resume", True):
+        print(
+            "note: resuming with a wall-clock budget or a shared --unique-cache under a node budget; "
+            "the result may differ from an uninterrupted run"
+        )
+    offsets = ckpt["streams"] if ckpt is not None else {}
+    pool_stream = JsonlWriter(out_dir / "nirvana_stage1_pool.jsonl", offsets.get("pool")) if args.stream else None
+    pass_stream = JsonlWriter(out_dir / "nirvana_stage2_passes.jsonl", offsets.get("passes")) if args.stream else None
+    reject_stream = JsonlWriter(out_dir / "nirvana_stage2_rejects.jsonl", offsets.get("rejects")) if args.stream else None
+    if ckpt is not None:
+        for r, state in zip(rngs, ckpt["rng_states"]):
+            r.setstate(rng_state_from_json(state))
+        rejects.update(ckpt["rejects"])
+        for counts, name in (
+            (stage1_attempts, "stage1_attempts"),
+            (stage1_pool_counts, "stage1_pool_counts"),
+            (stage2_evaluated, "stage2_evaluated"),
+            (stage2_prefiltered, "stage2_prefiltered"),
+        ):
+            counts.update({int(k): v for k, v in ckpt[name].items()})
+        unique_pool = ckpt["unique_pool"]
+        seen_generated_keys.update(ckpt["seen_keys"])
+        generated = ckpt["generated"]
+        next_id = ckpt["next_id"]
+        print(f"Resuming from {checkpoint_path} ({ckpt['stage']})")
+
+    last_checkpoint = time.monotonic()
+
+    def checkpoint(stage: str, **progress) -> None:
+        """Save everything needed to continue from this point, at most once per --checkpoint-interval."""
+        nonlocal last_checkpoint
+        if args.checkpoint_interval <= 0 or time.monotonic() - last_checkpoint < args.checkpoint_interval:
+            return
+        streams = (("pool", pool_stream), ("passes", pass_stream), ("rejects", reject_stream))
+        state = {
+            "options": {k: v for k, v in vars(args).items() if k not in RESUME_FREE_OPTIONS},
+            "exact_resume": resume_is_exact(args),
+            "stage": stage,
+            "rng_states": [rng_state_to_json(r.getstate()) for r in rngs],
+            "rejects": dict(rejects),
+            "stage1_attempts": stage1_attempts,
+            "stage1_pool_counts": stage1_pool_counts,
+            "stage2_evaluated": stage2_evaluated,
+            "stage2_prefiltered": stage2_prefiltered,
+            "unique_pool": unique_pool,
+            "seen_keys": sorted(seen_generated_keys),
+            "generated": generated,
+            "next_id": next_id,
+            "streams": {name: stream.tell() for name, stream in streams if stream is not None},
+            **progress,
+        }
+        save_checkpoint(checkpoint_path, state)
+        last_checkpoint = time.monotonic()
+
+    def stage2_reject(reason: str, entry: dict, **details) -> None:
+        rejects[reason] += 1
+        if reject_stream is not None:
+            reject_stream.write({"clues": entry["clues"], "puzzle": entry["puzzle"], "reject_reason": reason, **details})
 
     # Stage 1: generate large unique pool for each clue target.
     for clue in sorted(targets):
+        if clue in stage1_pool_counts:
+            continue  # finished before the checkpoint
+        resume_clue = ckpt is not None and ckpt["stage"] == "stage1" and ckpt["clue"] == clue
         target_pool = max(args.pool_min_per_clue, targets[clue] * args.pool_multiplier)
         pool, attempts = collect_unique_pool_for_clue(
             clue=clue,
@@ -410,47 +761,93 @@ def main() -> int:
             dig_bridge_floor=args.dig_bridge_floor,
             dig_backtrack_branch_limit=args.dig_backtrack_branch_limit,
             dig_backtrack_node_limit=args.dig_backtrack_node_limit,
+            canonical_keys=args.canonical_keys,
+            on_entry=pool_stream.write if pool_stream is not None else None,
+            start_pool=ckpt["clue_pool"] if resume_clue else None,
+            start_attempts=ckpt["attempts"] if resume_clue else 0,
+            on_attempt=lambda attempts, pool, clue=clue: checkpoint(
+                "stage1", clue=clue, clue_pool=pool, attempts=attempts
+            ),
         )
         unique_pool.extend(pool)
         stage1_attempts[clue] = attempts
         stage1_pool_counts[clue] = len(pool)
 
     # Stage 2: batch score the unique pool and keep best-matching candidates.
-    if args.shuffle_stage2:
+    stage2_resume = ckpt["stage2"] if ckpt is not None and ckpt["stage"] == "stage2" else None
+    if args.shuffle_stage2 and stage2_resume is None:
         rng.shuffle(unique_pool)
-    for clue in sorted(targets):
+    for clue_index, clue in enumerate(sorted(targets)):
+        if stage2_resume is not None and clue_index < stage2_resume["clue_index"]:
+            continue
         need = targets[clue]
         clue_pool = [item for item in unique_pool if item["clues"] == clue]
         passing: List[dict] = []
-        for entry in clue_pool:
+        start = 0
+        if stage2_resume is not None and clue_index == stage2_resume["clue_index"]:
+            passing = stage2_resume["passing"]
+            start = stage2_resume["entry_index"]
+        # Stops each solve as soon as its single ratio can no longer pass.
+        logic_budget = LogicBudget(
+            max_seconds=args.logic_max_seconds,
+            max_expensive=args.logic_max_expensive,
+            stop_when=single_ratio_stop(81 - clue, args.max_single_ratio),
+        )
+        for entry_index in range(start, len(clue_pool)):
+            checkpoint("stage2", stage2={"clue_index": clue_index, "entry_index": entry_index, "passing": passing})
+            entry = clue_pool[entry_index]
             stage2_evaluated[clue] += 1
             puzzle = entry["puzzle"]
             solution = entry["solution"]
 
-            logic = logic_solve(puzzle, allowed)
-            if not logic["solved"]:
-                rejects["stage2_not_logic_solvable"] += 1
+            if not args.no_singles_prefilter:
+                pre = singles_prefilter(puzzle, allowed, DEFAULT_WEIGHTS, args.min_score, args.max_single_ratio)
+                if pre is not None:
+                    stage2_reject(f"stage2_{pre[0]}", entry, difficulty_score=pre[1], prefilter="singles")
+                    stage2_prefiltered[clue] += 1
+                    continue
+
+            metrics = solve_metrics(
+                puzzle,
+                allowed,
+                DEFAULT_WEIGHTS,
+                cache=logic_cache,
+                budget=logic_budget,
+            )
+            if metrics.error == BUDGET_STOP:
+                stage2_reject("stage2_too_many_singles_early", entry)
+                continue
+            if metrics.error in (BUDGET_SECONDS, BUDGET_EXPENSIVE):
+                stage2_reject("stage2_logic_budget_exhausted", entry, logic_error=metrics.error)
+                continue
+            if not metrics.solved:
+                stage2_reject("stage2_not_logic_solvable", entry, logic_error=metrics.error)
                 continue
 
-            score, max_tech, single_ratio, technique_counts = score_trace(logic["trace"], DEFAULT_WEIGHTS)
+            score, max_tech, single_ratio = metrics.score, metrics.max_technique, metrics.single_ratio
+            technique_counts = metrics.technique_counts
             if score < args.min_score:
-                rejects["stage2_low_score"] += 1
+                stage2_reject("stage2_low_score", entry, difficulty_score=score)
                 continue
             if single_ratio > args.max_single_ratio:
-                rejects["stage2_too_many_singles"] += 1
+                stage2_reject(
+                    "stage2_too_many_singles", entry, difficulty_score=score, single_ratio=round(single_ratio, 4)
+                )
                 continue
 
-            passing.append(
-                {
-                    "puzzle": puzzle,
-                    "solution": solution,
-                    "clues": clue,
-                    "difficulty_score": score,
-                    "max_technique": max_tech,
-                    "single_ratio": round(single_ratio, 4),
-                    "technique_counts": dict(sorted(technique_counts.items())),
-                }
-            )
+            passed = {
+                "puzzle": puzzle,
+                "solution": solution,
+                "clues": clue,
+                "difficulty_score": score,
+                "max_technique": max_tech,
+                "single_ratio": round(single_ratio, 4),
+                "technique_counts": dict(sorted(technique_counts.items())),
+                "search_nodes": entry.get("search_nodes"),
+            }
+            passing.append(passed)
+            if pass_stream is not None:
+                pass_stream.write(passed)
 
         passing.sort(
             key=lambda x: (
@@ -471,15 +868,21 @@ def main() -> int:
         if len(passing) > need:
             rejects["stage2_over_target_trim"] += len(passing) - need
 
-    out_dir = Path(args.output)
-    out_dir.mkdir(parents=True, exist_ok=True)
-
     gen_path = out_dir / "nirvana_generated_levels.json"
-    pool_path = out_dir / "nirvana_stage1_pool.json"
+    pool_path = out_dir / ("nirvana_stage1_pool" + (POOL_SUFFIX if args.pool_format == "npool" else ".json"))
     report_path = out_dir / "nirvana_generation_report.md"
 
     gen_path.write_text(json.dumps(generated, ensure_ascii=False, indent=2), encoding="utf-8")
-    pool_path.write_text(json.dumps(unique_pool, ensure_ascii=False, indent=2), encoding="utf-8")
+    for stream in (pool_stream, pass_stream, reject_stream):
+        if stream is not None:
+            stream.close()
+    if args.pool_format == "npool":
+        write_pool(pool_path, unique_pool)
+    elif pool_stream is not None:
+        # Already on disk line by line.
+        pool_path = pool_stream.path
+    else:
+        pool_path.write_text(json.dumps(unique_pool, ensure_ascii=False, indent=2), encoding="utf-8")
     report_path.write_text(
         make_report(
             targets=targets,
@@ -489,10 +892,21 @@ def main() -> int:
             stage2_evaluated=stage2_evaluated,
             rejects=rejects,
             unique_cache=unique_cache,
+            stage2_prefiltered=None if args.no_singles_prefilter else stage2_prefiltered,
+            logic_budget=LogicBudget(max_seconds=args.logic_max_seconds, max_expensive=args.logic_max_expensive),
+            logic_cache=logic_cache,
         ),
         encoding="utf-8",
     )
 
+    if logic_cache is not None:
+        logic_cache.close()
+    if unique_store is not None:
+        unique_store.record_run(str(out_dir))
+        unique_store.close()
+    # Finished: a later --resume starts a fresh run.
+    checkpoint_path.unlink(missing_ok=True)
+
     print(f"Done. generated={len(generated)}")
     print(f"- {gen_path}")
     print(f"- {pool_path}")
@@ -15,13 +15,21 @@ This script uses reproducible proxy buckets:
 
 from __future__ import annotations
 
+import argparse
 import json
 import random
 import re
 from pathlib import Path
 from typing import List, Optional, Sequence, Tuple
 
-from nirvana_filter import DEFAULT_TECHNIQUES, DEFAULT_WEIGHTS, count_solutions, logic_solve, score_trace
+from logic_cache import DEFAULT_LOGIC_CACHE_PATH, LogicMetricsCache, solve_metrics
+from nirvana_filter import DEFAULT_TECHNIQUES, DEFAULT_WEIGHTS
+from sudoku_solver import search
+
+try:
+    import sudoku_batch
+except ImportError:  # numpy missing: every puzzle goes through annotate_proxy_fast
+    sudoku_batch = None
 
 
 LEVELS_PATH = Path("levels.js")
@@ -47,63 +55,6 @@ def write_levels(levels: List[dict]) -> None:
     LEVELS_PATH.write_text(out, encoding="utf-8")
 
 
-def solve_one_and_nodes(board: Sequence[int]) -> Tuple[Optional[List[int]], int]:
-    grid = list(board)
-    nodes = 0
-
-    peers = []
-    for idx in range(81):
-        r, c = divmod(idx, 9)
-        p = set(r * 9 + j for j in range(9)) | set(i * 9 + c for i in range(9))
-        br, bc = (r // 3) * 3, (c // 3) * 3
-        p |= set((br + dr) * 9 + (bc + dc) for dr in range(3) for dc in range(3))
-        p.remove(idx)
-        peers.append(p)
-
-    def candidates(i: int) -> List[int]:
-        used = {grid[p] for p in peers[i] if grid[p] != 0}
-        return [d for d in range(1, 10) if d not in used]
-
-    def choose_cell() -> Optional[Tuple[int, List[int]]]:
-        best_i = None
-        best_vals = None
-        for i, v in enumerate(grid):
-            if v != 0:
-                continue
-            vals = candidates(i)
-            if len(vals) == 0:
-                return i, []
-            if best_i is None or len(vals) < len(best_vals):
-                best_i = i
-                best_vals = vals
-                if len(best_vals) == 1:
-                    break
-        if best_i is None:
-            return None
-        return best_i, best_vals
-
-    def dfs() -> bool:
-        nonlocal nodes
-        choice = choose_cell()
-        if choice is None:
-            return True
-        idx, vals = choice
-        if not vals:
-            return False
-        for d in vals:
-            nodes += 1
-            grid[idx] = d
-            if dfs():
-                return True
-            grid[idx] = 0
-        return False
-
-    ok = dfs()
-    if not ok:
-        return None, nodes
-    return grid[:], nodes
-
-
 def candidate_entropy(puzzle: Sequence[int]) -> Tuple[int, int]:
     peers = []
     for idx in range(81):
@@ -127,11 +78,11 @@ def candidate_entropy(puzzle: Sequence[int]) -> Tuple[int, int]:
     return total, max_c
 
 
-def annotate_proxy_fast(puzzle: Sequence[int]) -> dict:
-    logic = logic_solve(puzzle, DEFAULT_TECHNIQUES)
-    solved_by_logic = bool(logic["solved"])
+def annotate_proxy_fast(puzzle: Sequence[int], cache: Optional[LogicMetricsCache] = None) -> dict:
+    metrics = solve_metrics(puzzle, DEFAULT_TECHNIQUES, DEFAULT_WEIGHTS, cache=cache)
+    solved_by_logic = metrics.solved
     if solved_by_logic:
-        score, max_tech, single_ratio, _ = score_trace(logic["trace"], DEFAULT_WEIGHTS)
+        score, max_tech, single_ratio = metrics.score, metrics.max_technique, metrics.single_ratio
     else:
         score, max_tech, single_ratio = 999, "unknown", 1.0
 
@@ -146,6 +97,36 @@ def annotate_proxy_fast(puzzle: Sequence[int]) -> dict:
     }
 
 
+def annotate_singles_batch(puzzles: Sequence[Sequence[int]]) -> List[Optional[dict]]:
+    """
+    annotate_proxy_fast for a whole chunk of puzzles with one vectorized pass.
+    Puzzles closed by singles get their annotation here; None means the
+    puzzle still needs the per-puzzle logic solve.
+    """
+    if sudoku_batch is None or not puzzles:
+        return [None] * len(puzzles)
+    grids = sudoku_batch.to_array(puzzles)
+    ent_sum, ent_max = sudoku_batch.candidate_entropy(grids)
+    metrics = sudoku_batch.singles_logic_metrics(grids, DEFAULT_TECHNIQUES, DEFAULT_WEIGHTS)
+    out: List[Optional[dict]] = []
+    for i, m in enumerate(metrics):
+        if m is None:
+            out.append(None)
+            continue
+        score, max_tech, single_ratio = m
+        out.append(
+            {
+                "solved_by_logic": True,
+                "difficulty_score": int(score),
+                "max_technique": max_tech,
+                "single_ratio": round(float(single_ratio), 4),
+                "entropy_sum": int(ent_sum[i]),
+                "entropy_max": int(ent_max[i]),
+            }
+        )
+    return out
+
+
 def build_new_level(
     *,
     level_id: int,
@@ -176,6 +157,14 @@ def build_new_level(
 
 
 def main() -> int:
+    parser = argparse.ArgumentParser(description="Append the stars 6-8 tiers to levels.js.")
+    parser.add_argument(
+        "--logic-cache",
+        default=str(DEFAULT_LOGIC_CACHE_PATH),
+        help="SQLite cache of logic metrics shared by the scoring tools; empty string disables it.",
+    )
+    args = parser.parse_args()
+
     random.seed(20260204)
     levels = load_levels()
     imported = json.loads(POOL_PATH.read_text(encoding="utf-8"))
@@ -191,14 +180,19 @@ def main() -> int:
     solved_hard: List[dict] = []
     unsolved_logic: List[dict] = []
     scan_limit = 26000
+    chunk_size = 2048
+    quick: List[Optional[dict]] = []
+    logic_cache = LogicMetricsCache(Path(args.logic_cache)) if args.logic_cache else None
 
     for n, row in enumerate(imported, 1):
+        if (n - 1) % chunk_size == 0:
+            quick = annotate_singles_batch([r["puzzle"] for r in imported[n - 1 : n - 1 + chunk_size]])
         puzzle = row["puzzle"]
         key = "".join(map(str, puzzle))
         if key in existing_keys:
             continue
 
-        ann = annotate_proxy_fast(puzzle)
+        ann = quick[(n - 1) % chunk_size] or annotate_proxy_fast(puzzle, logic_cache)
         item = {"puzzle": puzzle, **ann}
         if ann["solved_by_logic"] and ann["difficulty_score"] >= 85:
             solved_hard.append(item)
@@ -209,6 +203,9 @@ def main() -> int:
             break
         if n >= scan_limit:
             break
+    if logic_cache is not None:
+        print(f"Logic metrics cache: {logic_cache.summary()}")
+        logic_cache.close()
 
     if len(solved_hard) < 40:
         raise SystemExit(f"Not enough hard solved candidates: {len(solved_hard)}")
@@ -256,16 +253,16 @@ def main() -> int:
     if len(bucket_sword) < 40 or len(bucket_aic) < 40:
         raise SystemExit("Insufficient distinct Swordfish/AIC proxy candidates")
 
-    # Compute verified unique solution + search nodes only for final 120.
+    # Verify uniqueness, keep the solution and search nodes in one pass, only for final 120.
     for bucket_name, bucket in (("空鏡", bucket_xy), ("星潮", bucket_sword), ("玄鏈", bucket_aic)):
         for x in bucket:
-            if count_solutions(x["puzzle"], 2) != 1:
-                raise SystemExit(f"{bucket_name} contains non-unique puzzle")
-            solution, nodes = solve_one_and_nodes(x["puzzle"])
-            if solution is None:
+            result = search(x["puzzle"], limit=2)
+            if result.count == 0:
                 raise SystemExit(f"{bucket_name} contains unsolved puzzle")
-            x["solution"] = solution
-            x["search_nodes"] = nodes
+            if result.count != 1:
+                raise SystemExit(f"{bucket_name} contains non-unique puzzle")
+            x["solution"] = result.solution
+            x["search_nodes"] = result.nodes
 
     new_levels: List[dict] = []
     next_id = max_id + 1
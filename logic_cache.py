@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of logic_solve metrics (SQLite, standard library only).
+
+Entries are content-addressed: the key hashes the puzzle, the technique
+list, the weights and LOGIC_ENGINE_VERSION, so changing any of them simply
+misses instead of returning stale numbers. Each entry stores what the
+scoring tools read back from score_trace: score, max technique, single
+ratio and technique counts, plus solved/error, and the order in which the
+techniques fired (technique index, placed?) per step. That order lets a
+LogicBudget's stop_when / max_expensive be replayed on a hit exactly as a
+live budgeted run would have stopped, so cold and warm runs reject the same
+puzzles for the same reasons. Full step traces, which only
+candidate output needs, live in a second table under the same key
+(zlib-compressed JSON) and are filled by solve_trace() on demand.
+
+Usage from a tool:
+  cache = LogicMetricsCache(Path(args.logic_cache)) if args.logic_cache else None
+  metrics = solve_metrics(puzzle, allowed, DEFAULT_WEIGHTS, cache=cache)
+  ...
+  if cache is not None:
+      cache.close()
+
+Inspect a cache file:
+  python logic_cache.py --path .cache/logic_metrics.sqlite
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from nirvana_filter import (
+    BUDGET_EXPENSIVE,
+    BUDGET_SECONDS,
+    BUDGET_STOP,
+    DEFAULT_WEIGHTS,
+    LOGIC_ENGINE_VERSION,
+    LogicBudget,
+    StepCounts,
+    logic_solve,
+    score_trace,
+)
+
+
+DEFAULT_LOGIC_CACHE_PATH = Path(".cache/logic_metrics.sqlite")
+
+# (index into the technique list, whether the step placed a digit), in solve order.
+StepOrder = List[Tuple[int, bool]]
+
+
+@dataclass
+class LogicMetrics:
+    solved: bool
+    score: int = 0
+    max_technique: str = "none"
+    single_ratio: float = 0.0
+    # In first-seen order, as score_trace returns them.
+    technique_counts: Dict[str, int] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def metrics_key(puzzle: Sequence[int], techniques: Sequence[str], weights: Dict[str, int]) -> str:
+    payload = json.dumps(
+        ["".join(map(str, puzzle)), list(techniques), sorted(weights.items()), LOGIC_ENGINE_VERSION],
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class LogicMetricsCache:
+    def __init__(self, path: Path, commit_every: int = 500) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS logic_runs ("
+            "key TEXT PRIMARY KEY, solved INTEGER, score INTEGER, max_technique TEXT, "
+            "single_ratio REAL, technique_counts TEXT, error TEXT, steps TEXT)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS logic_traces (key TEXT PRIMARY KEY, trace BLOB)")
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self._pending = 0
+
+    def get(self, key: str) -> Optional[Tuple[LogicMetrics, StepOrder]]:
+        row = self._conn.execute(
+            "SELECT solved, score, max_technique, single_ratio, technique_counts, error, steps "
+            "FROM logic_runs WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        solved, score, max_tech, single_ratio, counts, error, steps = row
+        metrics = LogicMetrics(
+            solved=bool(solved),
+            score=score,
+            max_technique=max_tech,
+            single_ratio=single_ratio,
+            technique_counts=dict(json.loads(counts)),
+            error=error,
+        )
+        return metrics, [(i, bool(placed)) for i, placed in json.loads(steps)]
+
+    def put(self, key: str, metrics: LogicMetrics, steps: StepOrder) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO logic_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                int(metrics.solved),
+                metrics.score,
+                metrics.max_technique,
+                metrics.single_ratio,
+                json.dumps(list(metrics.technique_counts.items())),
+                metrics.error,
+                json.dumps([[i, int(placed)] for i, placed in steps], separators=(",", ":")),
+            ),
+        )
+        self.stored += 1
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+
+    def get_trace(self, key: str) -> Optional[List[dict]]:
+        row = self._conn.execute("SELECT trace FROM logic_traces WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put_trace(self, key: str, trace: List[dict]) -> None:
+        payload = zlib.compress(json.dumps(trace, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        self._conn.execute("INSERT OR REPLACE INTO logic_traces VALUES (?, ?)", (key, payload))
+        self.stored += 1
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+
+    def commit(self) -> None:
+        self._conn.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        self.commit()
+        self._conn.close()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM logic_runs").fetchone()[0]
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"hits={self.hits} misses={self.misses} hit_rate={rate:.1%} stored={self.stored}"
+
+
+def solve_metrics(
+    puzzle: Sequence[int],
+    techniques: Sequence[str],
+    weights: Dict[str, int] = DEFAULT_WEIGHTS,
+    cache: Optional[LogicMetricsCache] = None,
+    budget: Optional[LogicBudget] = None,
+) -> LogicMetrics:
+    """
+    logic_solve + score_trace, answered from `cache` when possible. A run cut
+    short by `budget` is returned as solved=False, error=BUDGET_*.
+
+    Without a cache the budget is applied live. With one, a miss is solved
+    without the stop_when / max_expensive rules (only max_seconds still
+    applies), stored, and those rules are then replayed on the stored step
+    order, the same way as on a hit. Runs cut short by max_seconds, and
+    contradictions, are not stored.
+    """
+    if cache is None:
+        logic = logic_solve(puzzle, techniques, metrics_only=True, budget=budget)
+        return metrics_of(logic, weights)
+
+    key = metrics_key(puzzle, techniques, weights)
+    hit = cache.get(key)
+    if hit is not None:
+        metrics, steps = hit
+    else:
+        seconds = budget.max_seconds if budget is not None else 0.0
+        logic = logic_solve(puzzle, techniques, budget=LogicBudget(max_seconds=seconds) if seconds > 0 else None)
+        metrics = metrics_of(logic, weights)
+        if metrics.error == BUDGET_SECONDS:
+            return metrics
+        if metrics.error == "contradiction":
+            # Not stored; the step order does not say which technique failed, so apply the budget live.
+            return metrics_of(logic_solve(puzzle, techniques, metrics_only=True, budget=budget), weights)
+        index = {name: i for i, name in enumerate(techniques)}
+        steps = [(index[step["technique"]], step["action"] == "place") for step in logic["trace"]]
+        cache.put(key, metrics, steps)
+    error = replay_budget(steps, metrics, techniques, budget)
+    return LogicMetrics(False, error=error) if error is not None else metrics
+
+
+def metrics_of(logic: dict, weights: Dict[str, int]) -> LogicMetrics:
+    if not logic["solved"]:
+        return LogicMetrics(False, error=logic["error"])
+    score, max_tech, single_ratio, counts = score_trace(logic["trace"], weights)
+    return LogicMetrics(True, score, max_tech, single_ratio, dict(counts))
+
+
+def replay_budget(
+    steps: StepOrder,
+    metrics: LogicMetrics,
+    techniques: Sequence[str],
+    budget: Optional[LogicBudget],
+) -> Optional[str]:
+    """
+    BUDGET_EXPENSIVE / BUDGET_STOP if a live run under `budget` would have
+    stopped with it, else None. Mirrors the cascade: before the step found
+    by technique i, techniques 0..i were each tried once; an unsolved board
+    ends with one more pass over all of them. max_seconds is not replayed.
+    """
+    if budget is None or metrics.error is not None:
+        return None
+    stop_when = budget.stop_when
+    max_expensive = budget.max_expensive
+    if stop_when is None and max_expensive <= 0:
+        return None
+    expensive = [name in budget.expensive for name in techniques]
+    used = 0
+
+    def over_budget(last: int) -> bool:
+        nonlocal used
+        if max_expensive <= 0:
+            return False
+        for i in range(last + 1):
+            if expensive[i]:
+                if used >= max_expensive:
+                    return True
+                used += 1
+        return False
+
+    counts = StepCounts()
+    for i, placed in steps:
+        if over_budget(i):
+            return BUDGET_EXPENSIVE
+        counts.add(techniques[i], "place" if placed else "eliminate", "")
+        if stop_when is not None and stop_when(counts):
+            return BUDGET_STOP
+    if not metrics.solved and over_budget(len(techniques) - 1):
+        return BUDGET_EXPENSIVE
+    return None
+
+
+def solve_trace(
+    puzzle: Sequence[int],
+    techniques: Sequence[str],
+    weights: Dict[str, int] = DEFAULT_WEIGHTS,
+    cache: Optional[LogicMetricsCache] = None,
+) -> List[dict]:
+    """The full logic_solve step trace (list of step dicts), answered from `cache` when possible."""
+    key = metrics_key(puzzle, techniques, weights) if cache is not None else ""
+    if cache is not None:
+        hit = cache.get_trace(key)
+        if hit is not None:
+            return hit
+    trace = logic_solve(puzzle, techniques)["trace"]
+    if cache is not None:
+        cache.put_trace(key, trace)
+    return trace
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Show the size of a logic metrics cache.")
+    parser.add_argument("--path", default=str(DEFAULT_LOGIC_CACHE_PATH))
+    args = parser.parse_args()
+
+    path = Path(args.path)
+    if not path.exists():
+        print(f"{path}: no cache yet")
+        return 0
+    cache = LogicMetricsCache(path)
+    print(f"{path}: {len(cache)} entries (engine version {LOGIC_ENGINE_VERSION})")
+    cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
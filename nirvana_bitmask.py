@@ -0,0 +1,1092 @@
+#!/usr/bin/env python3
+"""
+Bitmask candidate engine for the nirvana_filter logic techniques.
+
+Each cell stores its candidates as one 9-bit int (bit d-1 set = digit d is
+possible; solved cells hold 0). Every technique mirrors its set-based twin in
+nirvana_filter.py step for step, so `logic_solve_bitmask` returns the same
+trace, and therefore the same score, as `logic_solve(..., engine="set")`.
+
+Techniques work on a SolverState, which also keeps, for each of the 27
+units and each digit, a 9-bit mask of the unit slots still holding that
+digit. Hidden singles/pairs, locked candidates and fish read those masks
+directly instead of rebuilding them from the cells on every call.
+
+Incremental scheduling: every technique takes an optional `dirty` scope,
+(cell bits, digit bits) changed since that technique last found nothing.
+Candidates only ever shrink, so a pattern can only appear where its inputs
+changed; scanning the dirty part in the usual order therefore yields the
+same first step as a full scan. `dirty=None` always means a full scan.
+The scheduling is off by default: the per-loop mask snapshot and diff cost
+about what the narrower scans save (no measurable gain on levels.js or on
+17-clue puzzles with the default technique order).
+"""
+
+from __future__ import annotations
+
+import time
+from itertools import compress
+from operator import ne
+from typing import Callable, Dict, Generator, Iterator, List, Optional, Sequence, Tuple
+
+from nirvana_filter import (
+    BOXES,
+    BUDGET_EXPENSIVE,
+    BUDGET_SECONDS,
+    BUDGET_STOP,
+    COLS,
+    PEERS,
+    ROWS,
+    SINGLE_TECHNIQUES,
+    SUBSET_NAMES,
+    UNITS,
+    LogicBudget,
+    Step,
+    StepCounts,
+    StepTrace,
+    TraceSink,
+    cell_to_rc,
+    is_solved,
+    rc_to_cell,
+)
+
+
+ALL_MASK = 0x1FF
+DIGIT_BIT = [0] + [1 << (d - 1) for d in range(1, 10)]
+POPCOUNT = [bin(m).count("1") for m in range(512)]
+# Digit held by a single-candidate mask, 0 for every other mask.
+SINGLE_DIGIT = [m.bit_length() if POPCOUNT[m] == 1 else 0 for m in range(512)]
+MASK_DIGITS = [tuple(d for d in range(1, 10) if m & DIGIT_BIT[d]) for m in range(512)]
+IS_BIVALUE = [n == 2 for n in POPCOUNT]
+
+# Keep the iteration order of the PEERS sets so scans visit cells exactly like the set engine.
+PEER_LIST = [tuple(PEERS[idx]) for idx in range(81)]
+PEER_BITS = [sum(1 << p for p in PEERS[idx]) for idx in range(81)]
+ROW_OF = [idx // 9 for idx in range(81)]
+COL_OF = [idx % 9 for idx in range(81)]
+BOX_OF = [(idx // 27) * 3 + (idx % 9) // 3 for idx in range(81)]
+UNIT_BITS = [sum(1 << idx for idx in unit) for unit in UNITS]
+# Pivot plus its peers: the cells an XY-Wing around that pivot reads.
+PIVOT_BITS = [PEER_BITS[idx] | (1 << idx) for idx in range(81)]
+# COMMON_PEERS[a * 81 + b]: cells that see both a and b.
+COMMON_PEERS = [PEER_BITS[a] & PEER_BITS[b] for a in range(81) for b in range(81)]
+
+Dirty = Optional[Tuple[int, int]]
+
+
+def dirty_cells(cell_bits: int) -> List[int]:
+    out = []
+    while cell_bits:
+        low = cell_bits & -cell_bits
+        cell_bits ^= low
+        out.append(low.bit_length() - 1)
+    return out
+
+
+def mask_diff(before: Sequence[int], after: Sequence[int]) -> Tuple[int, int]:
+    """(cell bits, digit bits) of every candidate removed between two mask lists."""
+    cells = 0
+    digits = 0
+    for idx in compress(range(81), map(ne, before, after)):
+        cells |= 1 << idx
+        digits |= before[idx] ^ after[idx]
+    return cells, digits
+
+
+def initial_masks(board: Sequence[int]) -> Optional[List[int]]:
+    row_used = [0] * 9
+    col_used = [0] * 9
+    box_used = [0] * 9
+    for idx, v in enumerate(board):
+        if v == 0:
+            continue
+        bit = DIGIT_BIT[v]
+        r, c, b = ROW_OF[idx], COL_OF[idx], BOX_OF[idx]
+        if row_used[r] & bit or col_used[c] & bit or box_used[b] & bit:
+            return None
+        row_used[r] |= bit
+        col_used[c] |= bit
+        box_used[b] |= bit
+
+    masks = [0] * 81
+    for idx, v in enumerate(board):
+        if v != 0:
+            continue
+        m = ALL_MASK & ~(row_used[ROW_OF[idx]] | col_used[COL_OF[idx]] | box_used[BOX_OF[idx]])
+        if not m:
+            return None
+        masks[idx] = m
+    return masks
+
+
+def remove_mask(board: List[int], masks: List[int], idx: int, bit: int) -> bool:
+    m = masks[idx]
+    if board[idx] != 0 or not m & bit:
+        return True
+    m &= ~bit
+    masks[idx] = m
+    return m != 0
+
+
+def assign_mask(board: List[int], masks: List[int], idx: int, d: int) -> bool:
+    if board[idx] != 0:
+        return board[idx] == d
+    bit = DIGIT_BIT[d]
+    if not masks[idx] & bit:
+        return False
+    board[idx] = d
+    masks[idx] = 0
+    for p in PEER_LIST[idx]:
+        if not remove_mask(board, masks, p, bit):
+            return False
+    return True
+
+
+
+# (position-table offset of the unit, slot bit of the cell) for the cell's row, column and box.
+# Slots follow UNITS order: column in a row, row in a column, 3*dr+dc in a box.
+CELL_SLOTS = [
+    (
+        (ROW_OF[idx] * 10, 1 << COL_OF[idx]),
+        ((9 + COL_OF[idx]) * 10, 1 << ROW_OF[idx]),
+        ((18 + BOX_OF[idx]) * 10, 1 << ((ROW_OF[idx] % 3) * 3 + COL_OF[idx] % 3)),
+    )
+    for idx in range(81)
+]
+BOX_ROW_SLOTS = [0b000000111, 0b000111000, 0b111000000]
+BOX_COL_SLOTS = [0b001001001, 0b010010010, 0b100100100]
+
+
+class SolverState:
+    """
+    Board, candidate masks and a 27x9 table of digit positions per unit.
+    pos[u * 10 + d] holds the slots (see CELL_SLOTS) of unit u whose cell
+    still has candidate d; placed digits have no positions. All changes go
+    through assign() and remove_candidate() so the three stay in sync.
+
+    Hypotheses are tried in place: mark() starts (or nests) an undo trail,
+    and undo(mark) rolls every assignment and removal since then back.
+    """
+
+    __slots__ = ("board", "masks", "pos", "trail")
+
+    def __init__(self, board: List[int], masks: List[int], pos: List[int]) -> None:
+        self.board = board
+        self.masks = masks
+        self.pos = pos
+        # (idx, removed bits, placed) per change while a trial is open, else None.
+        self.trail: Optional[List[Tuple[int, int, bool]]] = None
+
+    @classmethod
+    def from_board(cls, board: Sequence[int]) -> Optional["SolverState"]:
+        work_board = list(board)
+        masks = initial_masks(work_board)
+        if masks is None:
+            return None
+        return cls.from_masks(work_board, masks)
+
+    @classmethod
+    def from_masks(cls, board: List[int], masks: List[int]) -> "SolverState":
+        pos = [0] * 270
+        for idx in range(81):
+            for d in MASK_DIGITS[masks[idx]]:
+                for base, slot in CELL_SLOTS[idx]:
+                    pos[base + d] |= slot
+        return cls(board, masks, pos)
+
+    def copy(self) -> "SolverState":
+        return SolverState(self.board[:], self.masks[:], self.pos[:])
+
+    def mark(self) -> int:
+        if self.trail is None:
+            self.trail = []
+        return len(self.trail)
+
+    def undo(self, mark: int) -> None:
+        trail = self.trail
+        board, masks, pos = self.board, self.masks, self.pos
+        while len(trail) > mark:
+            idx, bits, placed = trail.pop()
+            if placed:
+                board[idx] = 0
+            masks[idx] |= bits
+            for d in MASK_DIGITS[bits]:
+                for base, slot in CELL_SLOTS[idx]:
+                    pos[base + d] |= slot
+        if mark == 0:
+            self.trail = None
+
+    def unit_pos(self, unit_index: int, d: int) -> int:
+        return self.pos[unit_index * 10 + d]
+
+    def remove_candidate(self, idx: int, bit: int) -> bool:
+        """Drop candidate `bit` from idx; False if the cell is left without candidates."""
+        m = self.masks[idx]
+        if self.board[idx] != 0 or not m & bit:
+            return True
+        if self.trail is not None:
+            self.trail.append((idx, bit, False))
+        m &= ~bit
+        self.masks[idx] = m
+        d = bit.bit_length()
+        pos = self.pos
+        for base, slot in CELL_SLOTS[idx]:
+            pos[base + d] &= ~slot
+        return m != 0
+
+    def assign(self, idx: int, d: int) -> bool:
+        board = self.board
+        if board[idx] != 0:
+            return board[idx] == d
+        bit = DIGIT_BIT[d]
+        m = self.masks[idx]
+        if not m & bit:
+            return False
+        if self.trail is not None:
+            self.trail.append((idx, m, True))
+        board[idx] = d
+        self.masks[idx] = 0
+        pos = self.pos
+        for e in MASK_DIGITS[m]:
+            for base, slot in CELL_SLOTS[idx]:
+                pos[base + e] &= ~slot
+        for p in PEER_LIST[idx]:
+            if not self.remove_candidate(p, bit):
+                return False
+        return True
+
+    def remove_slots(self, unit_index: int, slots: int, bit: int) -> bool:
+        """remove_candidate on every cell of a unit selected by `slots`."""
+        unit = UNITS[unit_index]
+        while slots:
+            low = slots & -slots
+            slots ^= low
+            if not self.remove_candidate(unit[low.bit_length() - 1], bit):
+                return False
+        return True
+
+
+
+def _first_hidden_single(board: List[int], masks: List[int]) -> bool:
+    for unit in UNITS:
+        once = 0
+        more = 0
+        for idx in unit:
+            m = masks[idx]
+            more |= once & m
+            once |= m
+        if once & ~more:
+            return True
+    return False
+
+
+def singles_solve(board: Sequence[int], allowed_techniques: Sequence[str] = SINGLE_TECHNIQUES) -> dict:
+    """
+    Naked/hidden singles only, without a trace: how far singles alone get.
+    Only the single techniques in `allowed_techniques` are used. Returns
+    solved, placed (cells filled), remaining (blanks left), first_technique
+    (the single logic_solve would place first, in allowed order, or "none")
+    and error ("invalid_board" / "contradiction" / None).
+    """
+    work_board = list(board)
+    masks = initial_masks(work_board)
+    result = {"solved": False, "placed": 0, "remaining": work_board.count(0), "first_technique": "none", "error": None}
+    if masks is None:
+        result["error"] = "invalid_board"
+        return result
+    naked = "naked_single" in allowed_techniques
+    hidden = "hidden_single" in allowed_techniques
+    for name in allowed_techniques:
+        if name == "naked_single" and any(SINGLE_DIGIT[m] for m in masks):
+            result["first_technique"] = name
+            break
+        if name == "hidden_single" and _first_hidden_single(work_board, masks):
+            result["first_technique"] = name
+            break
+
+    placed = 0
+    progressed = True
+    while progressed:
+        progressed = False
+        if naked:
+            for idx in range(81):
+                d = SINGLE_DIGIT[masks[idx]]
+                if d and work_board[idx] == 0:
+                    if not assign_mask(work_board, masks, idx, d):
+                        result["error"] = "contradiction"
+                        break
+                    placed += 1
+                    progressed = True
+        if hidden and result["error"] is None:
+            for unit in UNITS:
+                filled = 0
+                once = 0
+                more = 0
+                for idx in unit:
+                    filled |= DIGIT_BIT[work_board[idx]]
+                    m = masks[idx]
+                    more |= once & m
+                    once |= m
+                if (once | filled) != ALL_MASK:
+                    result["error"] = "contradiction"
+                    break
+                singles = once & ~more
+                while singles:
+                    bit = singles & -singles
+                    singles ^= bit
+                    # -1 when an earlier single of this unit took the cell.
+                    idx = next((i for i in unit if masks[i] & bit), -1)
+                    if idx < 0 or not assign_mask(work_board, masks, idx, bit.bit_length()):
+                        result["error"] = "contradiction"
+                        break
+                    placed += 1
+                    progressed = True
+                if result["error"] is not None:
+                    break
+        if result["error"] is not None:
+            break
+
+    result["placed"] = placed
+    result["remaining"] = work_board.count(0)
+    result["solved"] = result["error"] is None and result["remaining"] == 0
+    return result
+
+
+
+def apply_naked_single(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    board, masks = state.board, state.masks
+    for idx in range(81) if dirty is None else dirty_cells(dirty[0]):
+        d = SINGLE_DIGIT[masks[idx]]
+        if d and board[idx] == 0:
+            if not state.assign(idx, d):
+                return False, False
+            r, c = cell_to_rc(idx)
+            trace.add("naked_single", "place", "r{}c{}={}", r + 1, c + 1, d)
+            return True, True
+    return True, False
+
+
+def apply_hidden_single(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    pos = state.pos
+    for ui, unit in enumerate(UNITS):
+        if dirty is not None and not dirty[0] & UNIT_BITS[ui]:
+            continue
+        base = ui * 10
+        for d in range(1, 10):
+            p = pos[base + d]
+            if p and not p & (p - 1):
+                idx = unit[p.bit_length() - 1]
+                if not state.assign(idx, d):
+                    return False, False
+                r, c = cell_to_rc(idx)
+                trace.add("hidden_single", "place", "r{}c{}={}", r + 1, c + 1, d)
+                return True, True
+    return True, False
+
+
+def apply_locked_candidates(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    pos = state.pos
+    # Pointing (box -> row/col)
+    for bi in range(9):
+        if dirty is not None and not dirty[0] & UNIT_BITS[18 + bi]:
+            continue
+        br, bc = (bi // 3) * 3, (bi % 3) * 3
+        base = (18 + bi) * 10
+        for d in range(1, 10):
+            p = pos[base + d]
+            if POPCOUNT[p] < 2:
+                continue
+            bit = DIGIT_BIT[d]
+            for j in range(3):
+                if p & ~BOX_ROW_SLOTS[j]:
+                    continue
+                r = br + j
+                targets = pos[r * 10 + d] & ~(7 << bc)
+                if targets:
+                    if not state.remove_slots(r, targets, bit):
+                        return False, False
+                    changed = POPCOUNT[targets]
+                    trace.add("locked_candidates", "eliminate", "pointing d{} row r{}, removed {}", d, r + 1, changed)
+                    return True, True
+            for j in range(3):
+                if p & ~BOX_COL_SLOTS[j]:
+                    continue
+                c = bc + j
+                targets = pos[(9 + c) * 10 + d] & ~(7 << br)
+                if targets:
+                    if not state.remove_slots(9 + c, targets, bit):
+                        return False, False
+                    changed = POPCOUNT[targets]
+                    trace.add("locked_candidates", "eliminate", "pointing d{} col c{}, removed {}", d, c + 1, changed)
+                    return True, True
+
+    # Claiming (row/col -> box)
+    for ui in range(18):
+        if dirty is not None and not dirty[0] & UNIT_BITS[ui]:
+            continue
+        is_row = ui < 9
+        line = ui if is_row else ui - 9
+        base = ui * 10
+        for d in range(1, 10):
+            p = pos[base + d]
+            if POPCOUNT[p] < 2:
+                continue
+            for j in range(3):
+                if not p & ~(7 << (3 * j)):
+                    break
+            else:
+                continue
+            bi = (line // 3) * 3 + j if is_row else j * 3 + line // 3
+            keep = BOX_ROW_SLOTS[line % 3] if is_row else BOX_COL_SLOTS[line % 3]
+            targets = pos[(18 + bi) * 10 + d] & ~keep
+            if targets:
+                if not state.remove_slots(18 + bi, targets, DIGIT_BIT[d]):
+                    return False, False
+                changed = POPCOUNT[targets]
+                kind = "row" if is_row else "col"
+                trace.add("locked_candidates", "eliminate", "claiming d{} {}{}, removed {}", d, kind, line + 1, changed)
+                return True, True
+    return True, False
+
+
+def fitting_combinations(
+    masks: Sequence[int], items: Sequence[int], size: int, need: int, start: int = 0, cover: int = 0
+) -> Iterator[Tuple[Tuple[int, ...], int]]:
+    """
+    (picked items, union mask) for every `size`-combination of items whose
+    masks[item] union spans at most `size` bits, in combinations() order;
+    `need` is how many items are still to pick. A partial pick whose union
+    already spans more than `size` bits is dropped with all its extensions.
+    Shared by the fish (lines -> cover lines) and subset (cells -> digits,
+    digits -> cells) searches.
+    """
+    for i in range(start, len(items) - need + 1):
+        item = items[i]
+        union = cover | masks[item]
+        if POPCOUNT[union] > size:
+            continue
+        if need == 1:
+            yield (item,), union
+            continue
+        for rest, full in fitting_combinations(masks, items, size, need - 1, i + 1, union):
+            yield (item,) + rest, full
+
+
+def apply_naked_subset(state: SolverState, trace: TraceSink, dirty: Dirty, size: int) -> Tuple[bool, bool]:
+    board, masks = state.board, state.masks
+    label = SUBSET_NAMES[size]
+    for ui, unit in enumerate(UNITS):
+        if dirty is not None and not dirty[0] & UNIT_BITS[ui]:
+            continue
+        unit_masks = [masks[idx] for idx in unit]
+        slots = [k for k in range(9) if 2 <= POPCOUNT[unit_masks[k]] <= size]
+        for subset, digits in fitting_combinations(unit_masks, slots, size, size):
+            if POPCOUNT[digits] != size:
+                continue
+            changed = 0
+            for k in range(9):
+                idx = unit[k]
+                if k in subset or board[idx] != 0:
+                    continue
+                for d in MASK_DIGITS[masks[idx] & digits]:
+                    if not state.remove_candidate(idx, DIGIT_BIT[d]):
+                        return False, False
+                    changed += 1
+            if changed:
+                trace.add("naked_" + label, "eliminate", "{} {} removed {}", label, MASK_DIGITS[digits], changed)
+                return True, True
+    return True, False
+
+
+def apply_hidden_subset(state: SolverState, trace: TraceSink, dirty: Dirty, size: int) -> Tuple[bool, bool]:
+    masks, pos = state.masks, state.pos
+    label = SUBSET_NAMES[size]
+    for ui, unit in enumerate(UNITS):
+        if dirty is not None and not dirty[0] & UNIT_BITS[ui]:
+            continue
+        digit_pos = pos[ui * 10 : ui * 10 + 10]
+        digits = [d for d in range(1, 10) if 2 <= POPCOUNT[digit_pos[d]] <= size]
+        for subset, cells in fitting_combinations(digit_pos, digits, size, size):
+            if POPCOUNT[cells] != size:
+                continue
+            keep = 0
+            for d in subset:
+                keep |= DIGIT_BIT[d]
+            changed = 0
+            for k in MASK_DIGITS[cells]:
+                idx = unit[k - 1]
+                drop = masks[idx] & ~keep
+                for d in MASK_DIGITS[drop]:
+                    state.remove_candidate(idx, DIGIT_BIT[d])
+                changed += POPCOUNT[drop]
+            if changed:
+                trace.add("hidden_" + label, "eliminate", "{} ({}) removed {}", label, ",".join(map(str, subset)), changed)
+                return True, True
+    return True, False
+
+
+def apply_naked_pair(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    return apply_naked_subset(state, trace, dirty, 2)
+
+
+def apply_hidden_pair(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    return apply_hidden_subset(state, trace, dirty, 2)
+
+
+def apply_naked_triple(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    return apply_naked_subset(state, trace, dirty, 3)
+
+
+def apply_hidden_triple(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    return apply_hidden_subset(state, trace, dirty, 3)
+
+
+def apply_naked_quad(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    return apply_naked_subset(state, trace, dirty, 4)
+
+
+def apply_hidden_quad(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    return apply_hidden_subset(state, trace, dirty, 4)
+
+
+def bivalue_index(masks: Sequence[int]) -> Tuple[List[int], List[int], Dict[int, int]]:
+    """
+    Bivalue cells as (ascending cells, cell bits per digit, cell bits per pair
+    mask), built in one pass so the wing searches never rescan peers for them.
+    """
+    cells = list(compress(range(81), map(IS_BIVALUE.__getitem__, masks)))
+    by_digit = [0] * 10
+    by_pair: Dict[int, int] = {}
+    for idx in cells:
+        m = masks[idx]
+        bit = 1 << idx
+        a, b = MASK_DIGITS[m]
+        by_digit[a] |= bit
+        by_digit[b] |= bit
+        by_pair[m] = by_pair.get(m, 0) | bit
+    return cells, by_digit, by_pair
+
+
+def _remove_from_cells(state: SolverState, cells: int, bit: int) -> Optional[int]:
+    """Remove `bit` from every cell in the `cells` bitset; count, or None on contradiction."""
+    masks = state.masks
+    changed = 0
+    while cells:
+        low = cells & -cells
+        cells ^= low
+        t = low.bit_length() - 1
+        if masks[t] & bit:
+            if not state.remove_candidate(t, bit):
+                return None
+            changed += 1
+    return changed
+
+
+def apply_xy_wing(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    masks = state.masks
+    bivalues, by_digit, by_pair = bivalue_index(masks)
+    for pivot in bivalues:
+        pm = masks[pivot]
+        if dirty is not None and not dirty[0] & PIVOT_BITS[pivot]:
+            continue
+        a, b = MASK_DIGITS[pm]
+        bit_a, bit_b = DIGIT_BIT[a], DIGIT_BIT[b]
+        wing_a = by_digit[a] & ~by_digit[b] & PEER_BITS[pivot]
+        wing_b = by_digit[b] & ~by_digit[a] & PEER_BITS[pivot]
+        if not wing_a or not wing_b:
+            continue
+
+        for w1 in PEER_LIST[pivot]:
+            if not wing_a >> w1 & 1:
+                continue
+            z1 = masks[w1] & ~bit_a
+            partners = wing_b & by_pair.get(bit_b | z1, 0)
+            if not partners:
+                continue
+            for w2 in PEER_LIST[pivot]:
+                if not partners >> w2 & 1:
+                    continue
+                changed = _remove_from_cells(state, COMMON_PEERS[w1 * 81 + w2] & ~(1 << pivot), z1)
+                if changed is None:
+                    return False, False
+                if changed:
+                    z = z1.bit_length()
+                    rp, cp = cell_to_rc(pivot)
+                    r1, c1 = cell_to_rc(w1)
+                    r2, c2 = cell_to_rc(w2)
+                    trace.add(
+                        "xy_wing",
+                        "eliminate",
+                        "pivot r{}c{}, wings r{}c{}/r{}c{}, z={}, removed {}",
+                        rp + 1, cp + 1, r1 + 1, c1 + 1, r2 + 1, c2 + 1, z, changed,
+                    )
+                    return True, True
+    return True, False
+
+
+def apply_xyz_wing(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    masks = state.masks
+    _, by_digit, _ = bivalue_index(masks)
+    for pivot in range(81):
+        pm = masks[pivot]
+        if POPCOUNT[pm] != 3:
+            continue
+        if dirty is not None and not dirty[0] & PIVOT_BITS[pivot]:
+            continue
+        near = 0
+        for d in MASK_DIGITS[pm]:
+            near |= by_digit[d]
+        near &= PEER_BITS[pivot]
+        wings = [w for w in PEER_LIST[pivot] if near >> w & 1 and not masks[w] & ~pm]
+        for i, w1 in enumerate(wings):
+            m1 = masks[w1]
+            for w2 in wings[i + 1 :]:
+                m2 = masks[w2]
+                if m1 == m2 or m1 | m2 != pm:
+                    continue
+                z_bit = m1 & m2
+                common = COMMON_PEERS[pivot * 81 + w1] & PEER_BITS[w2]
+                changed = _remove_from_cells(state, common, z_bit)
+                if changed is None:
+                    return False, False
+                if changed:
+                    rp, cp = cell_to_rc(pivot)
+                    r1, c1 = cell_to_rc(w1)
+                    r2, c2 = cell_to_rc(w2)
+                    trace.add(
+                        "xyz_wing",
+                        "eliminate",
+                        "pivot r{}c{}, wings r{}c{}/r{}c{}, z={}, removed {}",
+                        rp + 1, cp + 1, r1 + 1, c1 + 1, r2 + 1, c2 + 1, z_bit.bit_length(), changed,
+                    )
+                    return True, True
+    return True, False
+
+
+def apply_w_wing(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    masks, pos = state.masks, state.pos
+    bivalues, _, by_pair = bivalue_index(masks)
+    for w1 in bivalues:
+        pm = masks[w1]
+        for w2 in dirty_cells(by_pair[pm] & ~PIVOT_BITS[w1] & ~((2 << w1) - 1)):
+            near = PIVOT_BITS[w1] | PIVOT_BITS[w2]
+            for x in MASK_DIGITS[pm]:
+                y_bit = pm & ~DIGIT_BIT[x]
+                for ui in range(27):
+                    if dirty is not None and not dirty[0] & (near | UNIT_BITS[ui]):
+                        continue
+                    p = pos[ui * 10 + x]
+                    if POPCOUNT[p] != 2:
+                        continue
+                    k1, k2 = MASK_DIGITS[p]
+                    c1, c2 = UNITS[ui][k1 - 1], UNITS[ui][k2 - 1]
+                    linked = (PEER_BITS[w1] >> c1 & 1 and PEER_BITS[w2] >> c2 & 1) or (
+                        PEER_BITS[w1] >> c2 & 1 and PEER_BITS[w2] >> c1 & 1
+                    )
+                    if not linked:
+                        continue
+                    changed = _remove_from_cells(state, COMMON_PEERS[w1 * 81 + w2], y_bit)
+                    if changed is None:
+                        return False, False
+                    if changed:
+                        r1, cc1 = cell_to_rc(w1)
+                        r2, cc2 = cell_to_rc(w2)
+                        trace.add(
+                            "w_wing",
+                            "eliminate",
+                            "wings r{}c{}/r{}c{}, link d{}, z={}, removed {}",
+                            r1 + 1, cc1 + 1, r2 + 1, cc2 + 1, x, y_bit.bit_length(), changed,
+                        )
+                        return True, True
+    return True, False
+
+
+def _fish_eliminate(state: SolverState, d: int, base: Sequence[int], cover: int, by_row: bool) -> Optional[int]:
+    """Remove d from the cover lines outside the base lines; count, or None on contradiction."""
+    offset = 0 if by_row else 9
+    bit = DIGIT_BIT[d]
+    changed = 0
+    for line in range(9):
+        if line in base:
+            continue
+        hits = state.pos[(offset + line) * 10 + d] & cover
+        if hits:
+            if not state.remove_slots(offset + line, hits, bit):
+                return None
+            changed += POPCOUNT[hits]
+    return changed
+
+
+def apply_fish(state: SolverState, trace: TraceSink, dirty: Dirty, size: int, name: str) -> Tuple[bool, bool]:
+    """X-Wing / Swordfish / Jellyfish on the row and column position masks."""
+    pos = state.pos
+    for offset, by_row_orient in ((0, True), (9, False)):
+        base_kind, cover_kind = ("rows", "cols") if by_row_orient else ("cols", "rows")
+        for d in range(1, 10):
+            if dirty is not None and not dirty[1] & DIGIT_BIT[d]:
+                continue
+            lines = [pos[(offset + i) * 10 + d] for i in range(9)]
+            base_lines = [i for i in range(9) if 2 <= POPCOUNT[lines[i]] <= size]
+            for base, cover in fitting_combinations(lines, base_lines, size, size):
+                if POPCOUNT[cover] != size:
+                    continue
+                changed = _fish_eliminate(state, d, base, cover, by_row_orient)
+                if changed is None:
+                    return False, False
+                if changed:
+                    base_txt = ",".join(str(line + 1) for line in base)
+                    cover_txt = ",".join(map(str, MASK_DIGITS[cover]))
+                    trace.add(name, "eliminate", "d{} {} {} {} {} removed {}", d, base_kind, base_txt, cover_kind, cover_txt, changed)
+                    return True, True
+    return True, False
+
+
+def apply_x_wing(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    return apply_fish(state, trace, dirty, 2, "x_wing")
+
+
+def apply_swordfish(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    return apply_fish(state, trace, dirty, 3, "swordfish")
+
+
+def apply_jellyfish(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    return apply_fish(state, trace, dirty, 4, "jellyfish")
+
+
+TechniqueFunc = Callable[[SolverState, TraceSink, Dirty], Tuple[bool, bool]]
+
+
+def iter_cascade(
+    state: SolverState,
+    funcs: Sequence[TechniqueFunc],
+    trace: TraceSink,
+    max_loops: int,
+    incremental: bool = False,
+    check: Optional[Callable[[int], Optional[str]]] = None,
+) -> Generator[int, None, Optional[str]]:
+    """
+    Apply the first technique that makes progress, then restart from the
+    first one, until none fires or the board is solved. Yields the index of
+    the technique behind each step; returns None, "contradiction", or the
+    error `check(i)` reported before invoking technique i.
+    With `incremental`, each technique only re-examines what changed since it
+    last found nothing (see module docstring); the steps taken are identical.
+    """
+    board, masks = state.board, state.masks
+    # Per technique: changes since its last empty scan; None = full scan needed.
+    pending: List[Dirty] = [None] * len(funcs)
+    loops = 0
+    while 0 in board and loops < max_loops:
+        loops += 1
+        progressed = False
+        before = masks[:] if incremental else masks
+        for i, fn in enumerate(funcs):
+            dirty = pending[i]
+            if dirty == (0, 0):
+                continue
+            if check is not None:
+                error = check(i)
+                if error is not None:
+                    return error
+            ok, changed = fn(state, trace, dirty)
+            if not ok:
+                return "contradiction"
+            if changed:
+                if incremental:
+                    cells, digits = mask_diff(before, masks)
+                    for j, seen in enumerate(pending):
+                        if seen is not None:
+                            pending[j] = (seen[0] | cells, seen[1] | digits)
+                    # This technique may have more steps left anywhere.
+                    pending[i] = None
+                progressed = True
+                yield i
+                break
+            if incremental:
+                pending[i] = (0, 0)
+        if not progressed:
+            break
+    return None
+
+
+def finish(steps: Generator[object, None, object]) -> object:
+    """Run a step generator to the end and return its return value."""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+def run_cascade(
+    state: SolverState,
+    funcs: Sequence[TechniqueFunc],
+    trace: TraceSink,
+    max_loops: int,
+    incremental: bool = False,
+) -> bool:
+    """iter_cascade run to the end; False on contradiction."""
+    return finish(iter_cascade(state, funcs, trace, max_loops, incremental)) is None
+
+
+BASIC_PROPAGATION = (apply_naked_single, apply_hidden_single, apply_locked_candidates)
+
+
+def apply_basic_propagation(state: SolverState, max_loops: int = 200) -> bool:
+    # Trial propagation only needs the outcome, not the steps.
+    return run_cascade(state, BASIC_PROPAGATION, StepCounts(), max_loops)
+
+
+def forcing_contradiction(state: SolverState, idx: int, d: int) -> bool:
+    """Try d at idx in place, propagate, and roll the trial back."""
+    mark = state.mark()
+    contradiction = not state.assign(idx, d) or not apply_basic_propagation(state)
+    state.undo(mark)
+    return contradiction
+
+
+# ---------------------------------------------------------------------------
+# Alternating inference chains
+# ---------------------------------------------------------------------------
+#
+# A candidate node is idx * 10 + d. Strong links (at least one end true) come
+# from bivalue cells and from digits with exactly two positions in a unit;
+# weak links (at most one end true) join candidates of one cell and equal
+# digits in peer cells. Both are read off the candidate masks and the
+# position table, which assign()/remove_candidate() keep current, so the
+# link graph follows the state without being rebuilt.
+#
+# A chain starts with its first candidate assumed false and alternates
+# strong (false -> true) and weak (true -> false) links. Every candidate it
+# reaches as true means "start or end is true", so any candidate weakly
+# linked to both ends can go.
+
+AIC_MIN_LINKS = 3
+AIC_MAX_LINKS = 11
+
+
+def strong_links(state: SolverState, node: int) -> List[int]:
+    idx, d = divmod(node, 10)
+    out = []
+    m = state.masks[idx]
+    if POPCOUNT[m] == 2:
+        out.append(idx * 10 + (m & ~DIGIT_BIT[d]).bit_length())
+    pos = state.pos
+    for base, slot in CELL_SLOTS[idx]:
+        p = pos[base + d]
+        if POPCOUNT[p] == 2:
+            other = UNITS[base // 10][(p & ~slot).bit_length() - 1] * 10 + d
+            if other not in out:
+                out.append(other)
+    return out
+
+
+def weak_links(state: SolverState, node: int) -> List[int]:
+    idx, d = divmod(node, 10)
+    masks = state.masks
+    bit = DIGIT_BIT[d]
+    out = [idx * 10 + e for e in MASK_DIGITS[masks[idx] & ~bit]]
+    for p in PEER_LIST[idx]:
+        if masks[p] & bit:
+            out.append(p * 10 + d)
+    return out
+
+
+def chain_eliminations(state: SolverState, a: int, t: int) -> List[int]:
+    """Candidates weakly linked to both chain ends `a` and `t`."""
+    masks = state.masks
+    ai, ad = divmod(a, 10)
+    ti, td = divmod(t, 10)
+    out = []
+    if ad == td:
+        bit = DIGIT_BIT[ad]
+        common = PEER_BITS[ai] & PEER_BITS[ti] & ~((1 << ai) | (1 << ti))
+        while common:
+            low = common & -common
+            common ^= low
+            x = low.bit_length() - 1
+            if masks[x] & bit:
+                out.append(x * 10 + ad)
+    elif ai == ti:
+        out = [ai * 10 + e for e in MASK_DIGITS[masks[ai] & ~(DIGIT_BIT[ad] | DIGIT_BIT[td])]]
+    elif PEER_BITS[ai] >> ti & 1:
+        if masks[ai] & DIGIT_BIT[td]:
+            out.append(ai * 10 + td)
+        if masks[ti] & DIGIT_BIT[ad]:
+            out.append(ti * 10 + ad)
+    return out
+
+
+def find_aic(
+    state: SolverState, min_links: int = AIC_MIN_LINKS, max_links: int = AIC_MAX_LINKS
+) -> Optional[Tuple[List[int], List[int]]]:
+    """
+    Breadth-first search from every candidate (cell order, then digit) for the
+    shortest chain with eliminations. Returns (chain nodes, eliminated nodes).
+    """
+    masks = state.masks
+    for idx in range(81):
+        m = masks[idx]
+        if POPCOUNT[m] < 2:
+            continue
+        for d in MASK_DIGITS[m]:
+            start = idx * 10 + d
+            # Keyed by node * 2 + (1 if the node is true on this path).
+            parent = {start * 2: -1}
+            frontier = [start * 2]
+            links = 0
+            while frontier and links < max_links:
+                links += 1
+                nxt = []
+                for key in frontier:
+                    node = key >> 1
+                    now_on = not key & 1
+                    for nb in strong_links(state, node) if now_on else weak_links(state, node):
+                        nkey = nb * 2 + now_on
+                        if nkey in parent:
+                            continue
+                        parent[nkey] = key
+                        nxt.append(nkey)
+                        if now_on and links >= min_links and nb != start:
+                            elims = chain_eliminations(state, start, nb)
+                            if elims:
+                                chain = []
+                                while nkey != -1:
+                                    chain.append(nkey >> 1)
+                                    nkey = parent[nkey]
+                                return chain[::-1], elims
+                frontier = nxt
+    return None
+
+
+def chain_text(chain: Sequence[int]) -> str:
+    """Eureka-style chain, e.g. (5)r1c2=(5)r1c7-(5)r3c8=(2)r3c8; links alternate strong/weak."""
+    parts = []
+    for i, node in enumerate(chain):
+        idx, d = divmod(node, 10)
+        r, c = cell_to_rc(idx)
+        if i:
+            parts.append("=" if i % 2 else "-")
+        parts.append(f"({d})r{r+1}c{c+1}")
+    return "".join(parts)
+
+
+def apply_aic(state: SolverState, trace: TraceSink, dirty: Dirty = None) -> Tuple[bool, bool]:
+    # `dirty` is ignored: a chain can reach across the whole grid.
+    found = find_aic(state)
+    if found is not None:
+        chain, elims = found
+        for node in elims:
+            idx, d = divmod(node, 10)
+            if not state.remove_candidate(idx, DIGIT_BIT[d]):
+                return False, False
+        trace.add("aic", "eliminate", "chain length {}: {}, removed {}", len(chain) - 1, chain_text(chain), len(elims))
+        return True, True
+
+    # No chain within AIC_MAX_LINKS: fall back to a forcing contradiction.
+    board, masks = state.board, state.masks
+    for idx in range(81):
+        m = masks[idx]
+        if board[idx] != 0 or POPCOUNT[m] <= 1:
+            continue
+        for d in MASK_DIGITS[m]:
+            if forcing_contradiction(state, idx, d):
+                if not state.remove_candidate(idx, DIGIT_BIT[d]):
+                    return False, False
+                r, c = cell_to_rc(idx)
+                trace.add("aic", "eliminate", "forcing contradiction at r{}c{}, removed {}", r + 1, c + 1, d)
+                return True, True
+    return True, False
+
+
+MASK_TECHNIQUE_FUNCS: Dict[str, TechniqueFunc] = {
+    "naked_single": apply_naked_single,
+    "hidden_single": apply_hidden_single,
+    "locked_candidates": apply_locked_candidates,
+    "naked_pair": apply_naked_pair,
+    "hidden_pair": apply_hidden_pair,
+    "naked_triple": apply_naked_triple,
+    "hidden_triple": apply_hidden_triple,
+    "xy_wing": apply_xy_wing,
+    "xyz_wing": apply_xyz_wing,
+    "w_wing": apply_w_wing,
+    "x_wing": apply_x_wing,
+    "swordfish": apply_swordfish,
+    "naked_quad": apply_naked_quad,
+    "hidden_quad": apply_hidden_quad,
+    "jellyfish": apply_jellyfish,
+    "aic": apply_aic,
+}
+
+
+def budget_check(budget: Optional[LogicBudget], allowed_techniques: Sequence[str]) -> Optional[Callable[[int], Optional[str]]]:
+    """check(i) for iter_cascade: the budget error to stop with before technique i runs, or None when unlimited."""
+    if budget is None or (budget.max_seconds <= 0 and budget.max_expensive <= 0):
+        return None
+    deadline = time.perf_counter() + budget.max_seconds if budget.max_seconds > 0 else 0.0
+    max_expensive = budget.max_expensive
+    expensive = [name in budget.expensive for name in allowed_techniques]
+    used = 0
+
+    def check(i: int) -> Optional[str]:
+        nonlocal used
+        if deadline and time.perf_counter() > deadline:
+            return BUDGET_SECONDS
+        if max_expensive > 0 and expensive[i]:
+            if used >= max_expensive:
+                return BUDGET_EXPENSIVE
+            used += 1
+        return None
+
+    return check
+
+
+def iter_logic_steps(
+    board: Sequence[int],
+    allowed_techniques: Sequence[str],
+    incremental: bool = False,
+    metrics_only: bool = False,
+    budget: Optional[LogicBudget] = None,
+) -> Generator[Optional[Step], None, dict]:
+    """
+    Yields each step of logic_solve_bitmask as it is found (None with
+    `metrics_only`, where no Step is built) and returns its result dict.
+    """
+    trace: TraceSink = StepCounts() if metrics_only else StepTrace()
+    state = SolverState.from_board(board)
+    if state is None:
+        return {"solved": False, "trace": trace if metrics_only else [], "error": "invalid_board"}
+
+    funcs = [MASK_TECHNIQUE_FUNCS[name] for name in allowed_techniques]
+    stop_when = budget.stop_when if budget is not None else None
+    counts = trace if metrics_only or stop_when is None else StepCounts()
+    steps = iter_cascade(state, funcs, trace, 10000, incremental, budget_check(budget, allowed_techniques))
+    error = None
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            error = stop.value
+            break
+        step = None if metrics_only else trace[-1]
+        if counts is not trace:
+            counts.add(step.technique, step.action, "")
+        yield step
+        if stop_when is not None and stop_when(counts):
+            error = BUDGET_STOP
+            break
+
+    out = trace if metrics_only else [step.__dict__ for step in trace]
+    solved = error is None and is_solved(state.board)
+    return {"solved": solved, "trace": out, "error": error}
+
+
+def logic_solve_bitmask(
+    board: Sequence[int],
+    allowed_techniques: Sequence[str],
+    incremental: bool = False,
+    metrics_only: bool = False,
+    budget: Optional[LogicBudget] = None,
+) -> dict:
+    """See nirvana_filter.logic_solve; with `metrics_only` the trace is a StepCounts."""
+    return finish(iter_logic_steps(board, allowed_techniques, incremental, metrics_only, budget))
@@ -14,11 +14,14 @@ from __future__ import annotations
 import argparse
 import json
 import re
-from collections import Counter, defaultdict
+from collections import Counter
 from dataclasses import dataclass
 from itertools import combinations
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from typing import Callable, Dict, Generator, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import sudoku_solver
+from sudoku_solver import DEFAULT_BACKEND, SearchBudget, SearchStats
 
 
 DIGITS = set(range(1, 10))
@@ -74,6 +77,45 @@ class Step:
     detail: str
 
 
+class StepTrace(List[Step]):
+    """Full trace for the bitmask engine: every step as a Step with its detail text."""
+
+    def add(self, technique: str, action: str, fmt: str, *args: object) -> None:
+        self.append(Step(technique, action, fmt.format(*args)))
+
+
+class StepCounts:
+    """
+    Metrics-only trace: per-technique step counts and placement totals. The
+    detail format is never applied and no Step is built; score_trace accepts
+    it in place of a trace.
+    """
+
+    __slots__ = ("counts", "placements", "single_placements")
+
+    def __init__(self) -> None:
+        self.counts: Counter = Counter()
+        self.placements = 0
+        self.single_placements = 0
+
+    def add(self, technique: str, action: str, fmt: str, *args: object) -> None:
+        self.counts[technique] += 1
+        if action == "place":
+            self.placements += 1
+            if technique in SINGLE_TECHNIQUES:
+                self.single_placements += 1
+
+    @classmethod
+    def from_trace(cls, trace: Iterable[Step]) -> "StepCounts":
+        out = cls()
+        for step in trace:
+            out.add(step.technique, step.action, step.detail)
+        return out
+
+
+TraceSink = Union[StepTrace, StepCounts]
+
+
 def parse_bool(value: str) -> bool:
     lowered = value.lower()
     if lowered in {"1", "true", "yes", "y", "on"}:
@@ -84,7 +126,14 @@ def parse_bool(value: str) -> bool:
 
 
 def load_levels(input_path: Path) -> List[dict]:
+    if input_path.suffix.lower() == ".npool":
+        # Imported lazily: pool_format builds on this module.
+        from pool_format import read_pool
+
+        return read_pool(input_path)
     text = input_path.read_text(encoding="utf-8")
+    if input_path.suffix.lower() == ".jsonl":
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
     if input_path.suffix.lower() == ".json":
         data = json.loads(text)
         if not isinstance(data, list):
@@ -98,6 +147,42 @@ def load_levels(input_path: Path) -> List[dict]:
     return json.loads(payload)
 
 
+class JsonlWriter:
+    """One JSON record per line, flushed as written so a crashed run keeps everything before the crash."""
+
+    def __init__(self, path: Path, resume_at: Optional[int] = None) -> None:
+        """With `resume_at` (a tell() from a checkpoint), keep the file up to that byte and append after it."""
+        self.path = path
+        if resume_at is None:
+            self._f = path.open("w", encoding="utf-8")
+        else:
+            self._f = path.open("r+", encoding="utf-8")
+            self._f.truncate(resume_at)
+            self._f.seek(resume_at)
+        self.count = 0
+
+    def tell(self) -> int:
+        return self._f.tell()
+
+    def write(self, record: dict) -> None:
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def keep_jsonl_ids(path: Path, keep_ids: Set[object]) -> None:
+    """Rewrite a .jsonl file in place, keeping only the records whose id is in `keep_ids`."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with path.open("r", encoding="utf-8") as src, tmp_path.open("w", encoding="utf-8") as dst:
+        for line in src:
+            if json.loads(line).get("id") in keep_ids:
+                dst.write(line)
+    tmp_path.replace(path)
+
+
 def count_clues(puzzle: Sequence[int]) -> int:
     return sum(1 for v in puzzle if v != 0)
 
@@ -239,55 +324,87 @@ def apply_locked_candidates(board: List[int], cands: List[Set[int]], trace: List
     return True, False
 
 
-def apply_naked_pair(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
+SUBSET_NAMES = {2: "pair", 3: "triple", 4: "quad"}
+
+
+def apply_naked_subset(board: List[int], cands: List[Set[int]], trace: List[Step], size: int) -> Tuple[bool, bool]:
+    """`size` cells of a unit holding only `size` digits between them: drop those digits from the rest of the unit."""
+    label = SUBSET_NAMES[size]
     for unit in UNITS:
-        pair_map: Dict[Tuple[int, int], List[int]] = defaultdict(list)
-        for idx in unit:
-            if board[idx] == 0 and len(cands[idx]) == 2:
-                pair = tuple(sorted(cands[idx]))
-                pair_map[pair].append(idx)
-        for pair, cells in pair_map.items():
-            if len(cells) != 2:
+        cells = [idx for idx in unit if board[idx] == 0 and 2 <= len(cands[idx]) <= size]
+        for subset in combinations(cells, size):
+            digits: Set[int] = set()
+            for idx in subset:
+                digits |= cands[idx]
+            if len(digits) != size:
                 continue
             changed = 0
             for idx in unit:
-                if idx in cells or board[idx] != 0:
+                if idx in subset or board[idx] != 0:
                     continue
-                for d in pair:
+                for d in sorted(digits):
                     if d in cands[idx]:
                         if not remove_candidate(board, cands, idx, d):
                             return False, False
                         changed += 1
             if changed:
-                trace.append(Step("naked_pair", "eliminate", f"pair {pair} removed {changed}"))
+                trace.append(Step(f"naked_{label}", "eliminate", f"{label} {tuple(sorted(digits))} removed {changed}"))
                 return True, True
     return True, False
 
 
-def apply_hidden_pair(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
+def apply_hidden_subset(board: List[int], cands: List[Set[int]], trace: List[Step], size: int) -> Tuple[bool, bool]:
+    """`size` digits confined to `size` cells of a unit: drop every other digit from those cells."""
+    label = SUBSET_NAMES[size]
     for unit in UNITS:
         pos_by_digit: Dict[int, List[int]] = {}
         for d in range(1, 10):
             pos_by_digit[d] = [idx for idx in unit if board[idx] == 0 and d in cands[idx]]
-        for d1, d2 in combinations(range(1, 10), 2):
-            p1 = pos_by_digit[d1]
-            p2 = pos_by_digit[d2]
-            if len(p1) == 2 and p1 == p2:
-                changed = 0
-                for idx in p1:
-                    keep = {d1, d2}
-                    drop = cands[idx] - keep
-                    if drop:
-                        cands[idx].intersection_update(keep)
-                        if not cands[idx]:
-                            return False, False
-                        changed += len(drop)
-                if changed:
-                    trace.append(Step("hidden_pair", "eliminate", f"pair ({d1},{d2}) removed {changed}"))
-                    return True, True
+        digits = [d for d in range(1, 10) if 2 <= len(pos_by_digit[d]) <= size]
+        for subset in combinations(digits, size):
+            cells: Set[int] = set()
+            for d in subset:
+                cells.update(pos_by_digit[d])
+            if len(cells) != size:
+                continue
+            changed = 0
+            keep = set(subset)
+            for idx in sorted(cells):
+                drop = cands[idx] - keep
+                if drop:
+                    cands[idx].intersection_update(keep)
+                    changed += len(drop)
+            if changed:
+                digits_txt = ",".join(str(d) for d in subset)
+                trace.append(Step(f"hidden_{label}", "eliminate", f"{label} ({digits_txt}) removed {changed}"))
+                return True, True
     return True, False
 
 
+def apply_naked_pair(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
+    return apply_naked_subset(board, cands, trace, 2)
+
+
+def apply_hidden_pair(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
+    return apply_hidden_subset(board, cands, trace, 2)
+
+
+def apply_naked_triple(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
+    return apply_naked_subset(board, cands, trace, 3)
+
+
+def apply_hidden_triple(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
+    return apply_hidden_subset(board, cands, trace, 3)
+
+
+def apply_naked_quad(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
+    return apply_naked_subset(board, cands, trace, 4)
+
+
+def apply_hidden_quad(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
+    return apply_hidden_subset(board, cands, trace, 4)
+
+
 def apply_xy_wing(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
     for pivot in range(81):
         if board[pivot] != 0 or len(cands[pivot]) != 2:
@@ -334,132 +451,137 @@ def apply_xy_wing(board: List[int], cands: List[Set[int]], trace: List[Step]) ->
     return True, False
 
 
-def apply_x_wing(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
-    # Row-based X-Wing
-    for d in range(1, 10):
-        row_to_cols: Dict[int, Tuple[int, int]] = {}
-        for r in range(9):
-            cols = [c for c in range(9) if board[rc_to_cell(r, c)] == 0 and d in cands[rc_to_cell(r, c)]]
-            if len(cols) == 2:
-                row_to_cols[r] = (cols[0], cols[1])
-
-        for r1, r2 in combinations(sorted(row_to_cols.keys()), 2):
-            if row_to_cols[r1] != row_to_cols[r2]:
-                continue
-            c1, c2 = row_to_cols[r1]
-            changed = 0
-            for r in range(9):
-                if r in (r1, r2):
+def apply_xyz_wing(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
+    for pivot in range(81):
+        if board[pivot] != 0 or len(cands[pivot]) != 3:
+            continue
+        wings = [w for w in PEERS[pivot] if board[w] == 0 and len(cands[w]) == 2 and cands[w] <= cands[pivot]]
+        for i, w1 in enumerate(wings):
+            for w2 in wings[i + 1 :]:
+                if cands[w1] == cands[w2] or cands[w1] | cands[w2] != cands[pivot]:
                     continue
-                for c in (c1, c2):
-                    idx = rc_to_cell(r, c)
-                    if board[idx] == 0 and d in cands[idx]:
-                        if not remove_candidate(board, cands, idx, d):
-                            return False, False
-                        changed += 1
-            if changed:
-                trace.append(Step("x_wing", "eliminate", f"d{d} rows {r1+1},{r2+1} cols {c1+1},{c2+1} removed {changed}"))
-                return True, True
+                z = next(iter(cands[w1] & cands[w2]))
+                targets = PEERS[pivot] & PEERS[w1] & PEERS[w2]
+                changed = 0
+                for t in targets:
+                    if board[t] != 0 or z not in cands[t]:
+                        continue
+                    if not remove_candidate(board, cands, t, z):
+                        return False, False
+                    changed += 1
+                if changed:
+                    rp, cp = cell_to_rc(pivot)
+                    r1, c1 = cell_to_rc(w1)
+                    r2, c2 = cell_to_rc(w2)
+                    trace.append(
+                        Step(
+                            "xyz_wing",
+                            "eliminate",
+                            f"pivot r{rp+1}c{cp+1}, wings r{r1+1}c{c1+1}/r{r2+1}c{c2+1}, z={z}, removed {changed}",
+                        )
+                    )
+                    return True, True
+    return True, False
 
-    # Col-based X-Wing
-    for d in range(1, 10):
-        col_to_rows: Dict[int, Tuple[int, int]] = {}
-        for c in range(9):
-            rows = [r for r in range(9) if board[rc_to_cell(r, c)] == 0 and d in cands[rc_to_cell(r, c)]]
-            if len(rows) == 2:
-                col_to_rows[c] = (rows[0], rows[1])
 
-        for c1, c2 in combinations(sorted(col_to_rows.keys()), 2):
-            if col_to_rows[c1] != col_to_rows[c2]:
+def apply_w_wing(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
+    """
+    Two unrelated bivalue cells {x,y} whose x candidates are joined by a
+    conjugate pair (x in exactly two cells of a unit, one seeing each wing):
+    y is removed from every cell seeing both wings.
+    """
+    for w1 in range(81):
+        if board[w1] != 0 or len(cands[w1]) != 2:
+            continue
+        for w2 in range(w1 + 1, 81):
+            if board[w2] != 0 or cands[w2] != cands[w1] or w2 in PEERS[w1]:
                 continue
-            r1, r2 = col_to_rows[c1]
-            changed = 0
-            for c in range(9):
-                if c in (c1, c2):
-                    continue
-                for r in (r1, r2):
-                    idx = rc_to_cell(r, c)
-                    if board[idx] == 0 and d in cands[idx]:
-                        if not remove_candidate(board, cands, idx, d):
+            for x in sorted(cands[w1]):
+                y = next(iter(cands[w1] - {x}))
+                for unit in UNITS:
+                    cells = [idx for idx in unit if board[idx] == 0 and x in cands[idx]]
+                    if len(cells) != 2:
+                        continue
+                    c1, c2 = cells
+                    if not (
+                        (c1 in PEERS[w1] and c2 in PEERS[w2]) or (c2 in PEERS[w1] and c1 in PEERS[w2])
+                    ):
+                        continue
+                    changed = 0
+                    for t in PEERS[w1] & PEERS[w2]:
+                        if board[t] != 0 or y not in cands[t]:
+                            continue
+                        if not remove_candidate(board, cands, t, y):
                             return False, False
                         changed += 1
-            if changed:
-                trace.append(Step("x_wing", "eliminate", f"d{d} cols {c1+1},{c2+1} rows {r1+1},{r2+1} removed {changed}"))
-                return True, True
+                    if changed:
+                        r1, cc1 = cell_to_rc(w1)
+                        r2, cc2 = cell_to_rc(w2)
+                        trace.append(
+                            Step(
+                                "w_wing",
+                                "eliminate",
+                                f"wings r{r1+1}c{cc1+1}/r{r2+1}c{cc2+1}, link d{x}, z={y}, removed {changed}",
+                            )
+                        )
+                        return True, True
     return True, False
 
 
-def apply_swordfish(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
-    # Row-based Swordfish
-    for d in range(1, 10):
-        row_to_cols: Dict[int, Set[int]] = {}
-        for r in range(9):
-            cols = {c for c in range(9) if board[rc_to_cell(r, c)] == 0 and d in cands[rc_to_cell(r, c)]}
-            if 2 <= len(cols) <= 3:
-                row_to_cols[r] = cols
-
-        rows = sorted(row_to_cols.keys())
-        for r1, r2, r3 in combinations(rows, 3):
-            union_cols = row_to_cols[r1] | row_to_cols[r2] | row_to_cols[r3]
-            if len(union_cols) != 3:
-                continue
-            changed = 0
-            for r in range(9):
-                if r in (r1, r2, r3):
-                    continue
-                for c in union_cols:
-                    idx = rc_to_cell(r, c)
-                    if board[idx] == 0 and d in cands[idx]:
-                        if not remove_candidate(board, cands, idx, d):
-                            return False, False
-                        changed += 1
-            if changed:
-                cols_txt = ",".join(str(c + 1) for c in sorted(union_cols))
-                trace.append(
-                    Step(
-                        "swordfish",
-                        "eliminate",
-                        f"d{d} rows {r1+1},{r2+1},{r3+1} cols {cols_txt} removed {changed}",
-                    )
-                )
-                return True, True
-
-    # Col-based Swordfish
-    for d in range(1, 10):
-        col_to_rows: Dict[int, Set[int]] = {}
-        for c in range(9):
-            rows = {r for r in range(9) if board[rc_to_cell(r, c)] == 0 and d in cands[rc_to_cell(r, c)]}
-            if 2 <= len(rows) <= 3:
-                col_to_rows[c] = rows
-
-        cols = sorted(col_to_rows.keys())
-        for c1, c2, c3 in combinations(cols, 3):
-            union_rows = col_to_rows[c1] | col_to_rows[c2] | col_to_rows[c3]
-            if len(union_rows) != 3:
-                continue
-            changed = 0
-            for c in range(9):
-                if c in (c1, c2, c3):
+def apply_fish(board: List[int], cands: List[Set[int]], trace: List[Step], size: int, name: str) -> Tuple[bool, bool]:
+    """
+    Basic fish of `size` base lines (2 X-Wing, 3 Swordfish, 4 Jellyfish):
+    when `size` rows hold digit d only within `size` columns, d is removed
+    from the rest of those columns; likewise with rows and columns swapped.
+    """
+    for by_row in (True, False):
+        base_kind, cover_kind = ("rows", "cols") if by_row else ("cols", "rows")
+        for d in range(1, 10):
+            line_to_pos: Dict[int, Set[int]] = {}
+            for line in range(9):
+                cells = [rc_to_cell(line, k) if by_row else rc_to_cell(k, line) for k in range(9)]
+                found = {k for k, idx in enumerate(cells) if board[idx] == 0 and d in cands[idx]}
+                if 2 <= len(found) <= size:
+                    line_to_pos[line] = found
+
+            for base in combinations(sorted(line_to_pos.keys()), size):
+                cover: Set[int] = set()
+                for line in base:
+                    cover |= line_to_pos[line]
+                if len(cover) != size:
                     continue
-                for r in union_rows:
-                    idx = rc_to_cell(r, c)
-                    if board[idx] == 0 and d in cands[idx]:
-                        if not remove_candidate(board, cands, idx, d):
-                            return False, False
-                        changed += 1
-            if changed:
-                rows_txt = ",".join(str(r + 1) for r in sorted(union_rows))
-                trace.append(
-                    Step(
-                        "swordfish",
-                        "eliminate",
-                        f"d{d} cols {c1+1},{c2+1},{c3+1} rows {rows_txt} removed {changed}",
+                changed = 0
+                for line in range(9):
+                    if line in base:
+                        continue
+                    for k in cover:
+                        idx = rc_to_cell(line, k) if by_row else rc_to_cell(k, line)
+                        if board[idx] == 0 and d in cands[idx]:
+                            if not remove_candidate(board, cands, idx, d):
+                                return False, False
+                            changed += 1
+                if changed:
+                    base_txt = ",".join(str(line + 1) for line in base)
+                    cover_txt = ",".join(str(k + 1) for k in sorted(cover))
+                    trace.append(
+                        Step(name, "eliminate", f"d{d} {base_kind} {base_txt} {cover_kind} {cover_txt} removed {changed}")
                     )
-                )
-                return True, True
+                    return True, True
     return True, False
 
 
+def apply_x_wing(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
+    return apply_fish(board, cands, trace, 2, "x_wing")
+
+
+def apply_swordfish(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
+    return apply_fish(board, cands, trace, 3, "swordfish")
+
+
+def apply_jellyfish(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
+    return apply_fish(board, cands, trace, 4, "jellyfish")
+
+
 def clone_state(board: List[int], cands: List[Set[int]]) -> Tuple[List[int], List[Set[int]]]:
     return board[:], [s.copy() for s in cands]
 
@@ -492,11 +614,125 @@ def forcing_contradiction(board: List[int], cands: List[Set[int]], idx: int, d:
     return not apply_basic_propagation(tb, tc)
 
 
+AIC_MIN_LINKS = 3
+AIC_MAX_LINKS = 11
+
+
+def cell_units(idx: int) -> Tuple[List[int], List[int], List[int]]:
+    r, c = cell_to_rc(idx)
+    return ROWS[r], COLS[c], BOXES[(r // 3) * 3 + c // 3]
+
+
+def aic_strong_links(cands: List[Set[int]], idx: int, d: int) -> List[Tuple[int, int]]:
+    """Bivalue partner in the cell, then the conjugate of d in its row, column and box."""
+    out = []
+    if len(cands[idx]) == 2:
+        out.append((idx, min(cands[idx] - {d})))
+    for unit in cell_units(idx):
+        places = [p for p in unit if d in cands[p]]
+        if len(places) == 2:
+            other = (places[0] if places[1] == idx else places[1], d)
+            if other not in out:
+                out.append(other)
+    return out
+
+
+def aic_weak_links(cands: List[Set[int]], idx: int, d: int) -> List[Tuple[int, int]]:
+    out = [(idx, e) for e in sorted(cands[idx]) if e != d]
+    out.extend((p, d) for p in PEERS[idx] if d in cands[p])
+    return out
+
+
+def aic_eliminations(cands: List[Set[int]], a: Tuple[int, int], t: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """Candidates weakly linked to both chain ends."""
+    (ai, ad), (ti, td) = a, t
+    if ad == td:
+        common = sorted((PEERS[ai] & PEERS[ti]) - {ai, ti})
+        return [(x, ad) for x in common if ad in cands[x]]
+    if ai == ti:
+        return [(ai, e) for e in sorted(cands[ai] - {ad, td})]
+    out = []
+    if ti in PEERS[ai]:
+        if td in cands[ai]:
+            out.append((ai, td))
+        if ad in cands[ti]:
+            out.append((ti, ad))
+    return out
+
+
+def find_aic(
+    cands: List[Set[int]], min_links: int = AIC_MIN_LINKS, max_links: int = AIC_MAX_LINKS
+) -> Optional[Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]]:
+    """
+    Breadth-first search from every (cell, digit) candidate for the shortest
+    alternating chain with eliminations. The chain starts with its first
+    candidate assumed false; strong links turn a node on, weak links off.
+    Returns (chain, eliminated candidates).
+    """
+    for idx in range(81):
+        if len(cands[idx]) < 2:
+            continue
+        for d in sorted(cands[idx]):
+            start = (idx, d)
+            # Keyed by (candidate, True if the candidate is on along this path).
+            parent: Dict[Tuple[Tuple[int, int], bool], Optional[Tuple[Tuple[int, int], bool]]] = {
+                (start, False): None
+            }
+            frontier = [(start, False)]
+            links = 0
+            while frontier and links < max_links:
+                links += 1
+                nxt = []
+                for key in frontier:
+                    node, on = key
+                    now_on = not on
+                    links_of = aic_strong_links if now_on else aic_weak_links
+                    for nb in links_of(cands, *node):
+                        nkey = (nb, now_on)
+                        if nkey in parent:
+                            continue
+                        parent[nkey] = key
+                        nxt.append(nkey)
+                        if now_on and links >= min_links and nb != start:
+                            elims = aic_eliminations(cands, start, nb)
+                            if elims:
+                                chain = []
+                                cur: Optional[Tuple[Tuple[int, int], bool]] = nkey
+                                while cur is not None:
+                                    chain.append(cur[0])
+                                    cur = parent[cur]
+                                return chain[::-1], elims
+                frontier = nxt
+    return None
+
+
+def aic_chain_text(chain: List[Tuple[int, int]]) -> str:
+    parts = []
+    for i, (idx, d) in enumerate(chain):
+        r, c = cell_to_rc(idx)
+        if i:
+            parts.append("=" if i % 2 else "-")
+        parts.append(f"({d})r{r+1}c{c+1}")
+    return "".join(parts)
+
+
 def apply_aic(board: List[int], cands: List[Set[int]], trace: List[Step]) -> Tuple[bool, bool]:
     """
-    AIC/forcing-chain style elimination:
-    if assuming a candidate leads to contradiction, eliminate it.
+    Alternating inference chains over strong/weak candidate links. If no
+    chain is found, fall back to forcing contradiction: if assuming a
+    candidate leads to contradiction, eliminate it.
     """
+    found = find_aic(cands)
+    if found is not None:
+        chain, elims = found
+        for idx, d in elims:
+            if not remove_candidate(board, cands, idx, d):
+                return False, False
+        trace.append(
+            Step("aic", "eliminate", f"chain length {len(chain) - 1}: {aic_chain_text(chain)}, removed {len(elims)}")
+        )
+        return True, True
+
     for idx in range(81):
         if board[idx] != 0:
             continue
@@ -518,9 +754,16 @@ TECHNIQUE_FUNCS = {
     "locked_candidates": apply_locked_candidates,
     "naked_pair": apply_naked_pair,
     "hidden_pair": apply_hidden_pair,
+    "naked_triple": apply_naked_triple,
+    "hidden_triple": apply_hidden_triple,
     "xy_wing": apply_xy_wing,
+    "xyz_wing": apply_xyz_wing,
+    "w_wing": apply_w_wing,
     "x_wing": apply_x_wing,
     "swordfish": apply_swordfish,
+    "naked_quad": apply_naked_quad,
+    "hidden_quad": apply_hidden_quad,
+    "jellyfish": apply_jellyfish,
     "aic": apply_aic,
 }
 
@@ -530,30 +773,103 @@ DEFAULT_TECHNIQUES = [
     "locked_candidates",
     "naked_pair",
     "hidden_pair",
+    "naked_triple",
+    "hidden_triple",
     "xy_wing",
+    "xyz_wing",
+    "w_wing",
     "x_wing",
     "swordfish",
+    "naked_quad",
+    "hidden_quad",
+    "jellyfish",
     "aic",
 ]
 
+SINGLE_TECHNIQUES = ("naked_single", "hidden_single")
+
 DEFAULT_WEIGHTS = {
     "naked_single": 1,
     "hidden_single": 1,
     "locked_candidates": 2,
     "naked_pair": 3,
     "hidden_pair": 4,
+    "naked_triple": 5,
+    "hidden_triple": 6,
     "xy_wing": 7,
+    "xyz_wing": 8,
+    "w_wing": 8,
     "x_wing": 6,
     "swordfish": 8,
+    "naked_quad": 7,
+    "hidden_quad": 8,
+    "jellyfish": 9,
     "aic": 9,
 }
 
 
-def logic_solve(board: Sequence[int], allowed_techniques: Sequence[str]) -> dict:
+LOGIC_ENGINES = ("bitmask", "set")
+# Part of every logic_cache key: bump whenever a technique can produce
+# different steps, so cached metrics from older engines are not reused.
+LOGIC_ENGINE_VERSION = 1
+
+# Techniques whose invocations LogicBudget.max_expensive counts.
+EXPENSIVE_TECHNIQUES = ("aic",)
+# logic_solve "error" values for a run cut short by its LogicBudget.
+BUDGET_SECONDS = "budget_seconds"
+BUDGET_EXPENSIVE = "budget_expensive"
+BUDGET_STOP = "budget_stop"
+
+
+@dataclass
+class LogicBudget:
+    """
+    Limits for one logic_solve run; 0 / None disables that limit.
+    `stop_when` sees the running StepCounts after every step and ends the
+    run when it returns True, e.g. once a threshold can no longer be met.
+    """
+
+    max_seconds: float = 0.0
+    max_expensive: int = 0
+    expensive: Tuple[str, ...] = EXPENSIVE_TECHNIQUES
+    stop_when: Optional[Callable[[StepCounts], bool]] = None
+
+
+def logic_solve(
+    board: Sequence[int],
+    allowed_techniques: Sequence[str],
+    engine: str = "bitmask",
+    incremental: bool = False,
+    metrics_only: bool = False,
+    budget: Optional[LogicBudget] = None,
+) -> dict:
+    """
+    engine="bitmask" runs the 9-bit candidate engine in nirvana_bitmask.py;
+    engine="set" runs the reference List[Set[int]] techniques below.
+    Both produce identical traces. `incremental` (bitmask only, off by default)
+    lets each technique rescan just the units/digits changed since it last
+    found nothing.
+    With `metrics_only`, "trace" is a StepCounts instead of a list of step
+    dicts; the bitmask engine then never formats a step detail.
+    A `budget` (bitmask only) may end the run early: "solved" is then False
+    and "error" names the limit (BUDGET_SECONDS / BUDGET_EXPENSIVE / BUDGET_STOP).
+    """
+    if engine == "bitmask":
+        # Imported lazily: nirvana_bitmask builds on this module's tables.
+        from nirvana_bitmask import logic_solve_bitmask
+
+        return logic_solve_bitmask(
+            board, allowed_techniques, incremental=incremental, metrics_only=metrics_only, budget=budget
+        )
+    if engine != "set":
+        raise ValueError(f"Unknown logic engine: {engine}")
+    if budget is not None:
+        raise ValueError("LogicBudget is only supported by the bitmask engine")
+
     work_board = list(board)
     cands = initial_candidates(work_board)
     if cands is None:
-        return {"solved": False, "trace": [], "error": "invalid_board"}
+        return {"solved": False, "trace": StepCounts() if metrics_only else [], "error": "invalid_board"}
 
     trace: List[Step] = []
     funcs = [TECHNIQUE_FUNCS[name] for name in allowed_techniques]
@@ -566,71 +882,84 @@ def logic_solve(board: Sequence[int], allowed_techniques: Sequence[str]) -> dict
         for fn in funcs:
             ok, changed = fn(work_board, cands, trace)
             if not ok:
-                return {"solved": False, "trace": [step.__dict__ for step in trace], "error": "contradiction"}
+                out = StepCounts.from_trace(trace) if metrics_only else [step.__dict__ for step in trace]
+                return {"solved": False, "trace": out, "error": "contradiction"}
             if changed:
                 progressed = True
                 break
         if not progressed:
             break
 
-    return {"solved": is_solved(work_board), "trace": [step.__dict__ for step in trace], "error": None}
+    out = StepCounts.from_trace(trace) if metrics_only else [step.__dict__ for step in trace]
+    return {"solved": is_solved(work_board), "trace": out, "error": None}
 
 
-def count_solutions(board: Sequence[int], limit: int = 2) -> int:
-    grid = list(board)
-    solutions = 0
+def single_ratio_stop(blanks: int, max_single_ratio: float) -> Callable[[StepCounts], bool]:
+    """
+    LogicBudget.stop_when for a single-ratio ceiling: a solved board ends with
+    exactly `blanks` placements, so once single placements exceed
+    max_single_ratio * blanks the board fails either way (unsolved boards
+    are rejected too).
+    """
+    limit = max_single_ratio * blanks
+    return lambda counts: counts.single_placements > limit
 
-    def possible_values(idx: int) -> List[int]:
-        if grid[idx] != 0:
-            return []
-        used = {grid[p] for p in PEERS[idx] if grid[p] != 0}
-        return [d for d in range(1, 10) if d not in used]
 
-    def choose_cell() -> Optional[Tuple[int, List[int]]]:
-        best_idx = None
-        best_vals = None
-        for i in range(81):
-            if grid[i] != 0:
-                continue
-            vals = possible_values(i)
-            if len(vals) == 0:
-                return i, []
-            if best_idx is None or len(vals) < len(best_vals):
-                best_idx = i
-                best_vals = vals
-                if len(best_vals) == 1:
-                    break
-        if best_idx is None:
-            return None
-        return best_idx, best_vals
-
-    def dfs() -> None:
-        nonlocal solutions
-        if solutions >= limit:
-            return
-        choice = choose_cell()
-        if choice is None:
-            solutions += 1
-            return
-        idx, vals = choice
-        if not vals:
-            return
-        for d in vals:
-            grid[idx] = d
-            dfs()
-            grid[idx] = 0
-            if solutions >= limit:
-                return
-
-    # validate initial board
-    if initial_candidates(grid) is None:
-        return 0
-    dfs()
-    return solutions
-
-
-def score_trace(trace: List[dict], weights: Dict[str, int]) -> Tuple[int, str, float, Counter]:
-    counts = Counter(step["technique"] for step in trace)
+def logic_steps(
+    board: Sequence[int],
+    allowed_techniques: Sequence[str],
+    budget: Optional[LogicBudget] = None,
+    incremental: bool = False,
+) -> Generator[Step, None, dict]:
+    """
+    logic_solve one step at a time (bitmask engine): yields each Step as soon
+    as it is found and returns the logic_solve result dict. Closing the
+    generator early simply abandons the board, e.g. once a hint is found.
+    """
+    # Imported lazily: nirvana_bitmask builds on this module's tables.
+    from nirvana_bitmask import iter_logic_steps
+
+    return iter_logic_steps(board, allowed_techniques, budget=budget, incremental=incremental)
+
+
+COUNT_BACKENDS = sudoku_solver.BACKENDS
+
+
+def count_solutions(
+    board: Sequence[int],
+    limit: int = 2,
+    backend: str = DEFAULT_BACKEND,
+    stats: Optional[SearchStats] = None,
+    budget: Optional[SearchBudget] = None,
+) -> Optional[int]:
+    """
+    Count solutions up to `limit` with the shared solver in sudoku_solver.py.
+    When `stats` is given, the backend's search node count is added to it.
+    With a `budget`, returns None (unknown) if it ran out before `limit`
+    solutions were found.
+    """
+    if budget is None:
+        return sudoku_solver.count(board, limit=limit, backend=backend, stats=stats)
+    if stats is None:
+        stats = SearchStats()
+    aborted_before = stats.aborted
+    found = sudoku_solver.count(board, limit=limit, backend=backend, stats=stats, budget=budget)
+    if found < limit and stats.aborted > aborted_before:
+        return None
+    return found
+
+
+def score_trace(trace: Union[List[dict], StepCounts], weights: Dict[str, int]) -> Tuple[int, str, float, Counter]:
+    """(score, max_technique, single_ratio, technique counts) of a trace or of metrics-only StepCounts."""
+    if isinstance(trace, StepCounts):
+        counts = trace.counts
+        n_placements = trace.placements
+        n_single_places = trace.single_placements
+    else:
+        counts = Counter(step["technique"] for step in trace)
+        placements = [s for s in trace if s["action"] == "place"]
+        n_placements = len(placements)
+        n_single_places = sum(1 for s in placements if s["technique"] in {"naked_single", "hidden_single"})
     score = sum(weights.get(k, 1) * v for k, v in counts.items())
     max_tech = "none"
     max_w = -1
@@ -642,27 +971,61 @@ def score_trace(trace: List[dict], weights: Dict[str, int]) -> Tuple[int, str, f
             max_w = w
             max_tech = tech
 
-    placements = [s for s in trace if s["action"] == "place"]
-    single_places = [
-        s for s in placements if s["technique"] in {"naked_single", "hidden_single"}
-    ]
-    single_ratio = (len(single_places) / len(placements)) if placements else 0.0
+    single_ratio = (n_single_places / n_placements) if n_placements else 0.0
     return score, max_tech, single_ratio, counts
 
 
+def singles_prefilter(
+    board: Sequence[int],
+    allowed_techniques: Sequence[str],
+    weights: Dict[str, int],
+    min_score: int,
+    max_single_ratio: float,
+) -> Optional[Tuple[str, int, str, float]]:
+    """
+    Settle low_score / too_many_singles without the full technique stack.
+    Only boards closed by singles are decided: logic_solve then fills exactly
+    the blanks with singles, so score, max technique and single ratio follow
+    from the singles-only pass. Returns (reason, score, max_technique,
+    single_ratio), or None when the board must go through logic_solve.
+    """
+    singles = [t for t in allowed_techniques if t in SINGLE_TECHNIQUES]
+    if not singles or list(allowed_techniques[: len(singles)]) != singles:
+        return None
+    if len({weights.get(t, 1) for t in singles}) != 1:
+        return None
+    from nirvana_bitmask import singles_solve
+
+    result = singles_solve(board, singles)
+    if not result["solved"]:
+        return None
+    placed = result["placed"]
+    score = placed * weights.get(singles[0], 1)
+    single_ratio = 1.0 if placed else 0.0
+    if score < min_score:
+        reason = "low_score"
+    elif single_ratio > max_single_ratio:
+        reason = "too_many_singles"
+    else:
+        return None
+    return reason, score, result["first_technique"], single_ratio
+
+
 def make_report_md(
     total_levels: int,
     candidates: List[dict],
-    rejects: List[dict],
+    n_rejects: int,
     clue_counter: Counter,
     reject_counter: Counter,
+    prefilter_counter: Optional[Counter] = None,
+    logic_cache_summary: Optional[str] = None,
 ) -> str:
     lines = []
     lines.append("# NIRVANA Filter Report")
     lines.append("")
     lines.append(f"- Total input levels: **{total_levels}**")
     lines.append(f"- Passed candidates: **{len(candidates)}**")
-    lines.append(f"- Rejected: **{len(rejects)}**")
+    lines.append(f"- Rejected: **{n_rejects}**")
     lines.append("")
     lines.append("## Candidate clue distribution")
     if candidates:
@@ -672,12 +1035,22 @@ def make_report_md(
         lines.append("- (none)")
     lines.append("")
     lines.append("## Rejection reasons")
-    if rejects:
+    if n_rejects:
         for reason, count in reject_counter.most_common():
             lines.append(f"- {reason}: {count}")
     else:
         lines.append("- (none)")
     lines.append("")
+    if prefilter_counter is not None:
+        lines.append("## Singles pre-filter")
+        lines.append(f"- rejected before logic_solve: {sum(prefilter_counter.values())}")
+        for reason, count in prefilter_counter.most_common():
+            lines.append(f"- {reason}: {count}")
+        lines.append("")
+    if logic_cache_summary is not None:
+        lines.append("## Logic metrics cache")
+        lines.append(f"- {logic_cache_summary}")
+        lines.append("")
     lines.append("## Top 20 candidates by score")
     if candidates:
         top = sorted(candidates, key=lambda x: (-x["difficulty_score"], x["clues"], x["id"]))[:20]
@@ -714,8 +1087,32 @@ def main() -> int:
     parser.add_argument("--min-score", type=int, default=35)
     parser.add_argument("--max-single-ratio", type=float, default=0.65)
     parser.add_argument("--require-unique", type=parse_bool, default=True)
+    parser.add_argument(
+        "--singles-prefilter",
+        type=parse_bool,
+        default=True,
+        help="Reject singles-only boards with a fast singles pass before the full logic_solve.",
+    )
+    parser.add_argument(
+        "--logic-cache",
+        default=".cache/logic_metrics.sqlite",
+        help="SQLite cache of logic metrics shared by the scoring tools; empty string disables it.",
+    )
     parser.add_argument("--target-count", type=int, default=0, help="0 means unlimited")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help=(
+            "Append candidates and rejects to .jsonl files as they are produced instead of writing "
+            "JSON at the end; --target-count trims are then dropped from the candidates file at the "
+            "end and appended to the rejects file."
+        ),
+    )
     args = parser.parse_args()
+    # Imported lazily: logic_cache builds on this module.
+    from logic_cache import LogicMetricsCache, solve_metrics, solve_trace
+
+    logic_cache = LogicMetricsCache(Path(args.logic_cache)) if args.logic_cache else None
 
     input_path = Path(args.input)
     out_dir = Path(args.output)
@@ -730,11 +1127,37 @@ def main() -> int:
 
     levels = load_levels(input_path)
 
+    candidates_path = out_dir / ("nirvana_candidates.jsonl" if args.stream else "nirvana_candidates.json")
+    rejects_path = out_dir / ("nirvana_rejects.jsonl" if args.stream else "nirvana_rejects.json")
+    report_path = out_dir / "nirvana_report.md"
+    candidate_stream = JsonlWriter(candidates_path) if args.stream else None
+    reject_stream = JsonlWriter(rejects_path) if args.stream else None
+
     seen_ids = set()
     candidates: List[dict] = []
     rejects: List[dict] = []
+    # Small per-candidate summaries: ranking, --target-count and the report work from these and the counters.
+    summaries: List[dict] = []
     clue_counter = Counter()
     reject_counter = Counter()
+    prefilter_counter = Counter()
+
+    def add_reject(record: dict) -> None:
+        reject_counter[record["reject_reason"]] += 1
+        if reject_stream is not None:
+            reject_stream.write(record)
+        else:
+            rejects.append(record)
+
+    def add_candidate(record: dict) -> None:
+        summaries.append(
+            {k: record[k] for k in ("id", "displayName", "clues", "difficulty_score", "max_technique", "single_ratio")}
+        )
+        clue_counter[record["clues"]] += 1
+        if candidate_stream is not None:
+            candidate_stream.write(record)
+        else:
+            candidates.append(record)
 
     for lv in levels:
         lv_id = lv.get("id")
@@ -747,57 +1170,82 @@ def main() -> int:
 
         if lv_id in seen_ids:
             reason = "duplicate_id"
-            rejects.append({**base, "reject_reason": reason})
-            reject_counter[reason] += 1
+            add_reject({**base, "reject_reason": reason})
             continue
         seen_ids.add(lv_id)
 
         if not isinstance(puzzle, list):
             reason = "missing_puzzle"
-            rejects.append({**base, "reject_reason": reason})
-            reject_counter[reason] += 1
+            add_reject({**base, "reject_reason": reason})
             continue
 
         bad = validate_puzzle(puzzle)
         if bad:
-            rejects.append({**base, "reject_reason": bad})
-            reject_counter[bad] += 1
+            add_reject({**base, "reject_reason": bad})
             continue
 
         clues = count_clues(puzzle)
         if clues < args.min_clues or clues > args.max_clues:
             reason = "clues_out_of_range"
-            rejects.append({**base, "clues": clues, "reject_reason": reason})
-            reject_counter[reason] += 1
+            add_reject({**base, "clues": clues, "reject_reason": reason})
             continue
 
-        sol_count = count_solutions(puzzle, limit=2) if args.require_unique else -1
+        # One search gives the count, the solution and the node metric.
+        search = sudoku_solver.search(puzzle, limit=2) if args.require_unique else None
+        sol_count = search.count if search is not None else -1
+        search_nodes = search.nodes if search is not None else None
         if args.require_unique and sol_count != 1:
             reason = "no_solution" if sol_count == 0 else "multiple_solutions"
-            rejects.append({**base, "clues": clues, "solution_count": sol_count, "reject_reason": reason})
-            reject_counter[reason] += 1
+            add_reject(
+                {
+                    **base,
+                    "clues": clues,
+                    "solution_count": sol_count,
+                    "search_nodes": search_nodes,
+                    "reject_reason": reason,
+                }
+            )
             continue
 
-        logic = logic_solve(puzzle, allowed)
-        if not logic["solved"]:
+        if args.singles_prefilter:
+            pre = singles_prefilter(puzzle, allowed, DEFAULT_WEIGHTS, args.min_score, args.max_single_ratio)
+            if pre is not None:
+                reason, score, max_tech, single_ratio = pre
+                add_reject(
+                    {
+                        **base,
+                        "clues": clues,
+                        "solution_count": sol_count,
+                        "is_logic_solvable": True,
+                        "difficulty_score": score,
+                        "max_technique": max_tech,
+                        "single_ratio": round(single_ratio, 4),
+                        "reject_reason": reason,
+                        "prefilter": "singles",
+                    }
+                )
+                prefilter_counter[reason] += 1
+                continue
+
+        metrics = solve_metrics(puzzle, allowed, DEFAULT_WEIGHTS, cache=logic_cache)
+        if not metrics.solved:
             reason = "not_logic_solvable"
-            rejects.append(
+            add_reject(
                 {
                     **base,
                     "clues": clues,
                     "solution_count": sol_count,
                     "is_logic_solvable": False,
                     "reject_reason": reason,
-                    "logic_error": logic.get("error"),
+                    "logic_error": metrics.error,
                 }
             )
-            reject_counter[reason] += 1
             continue
 
-        score, max_tech, single_ratio, technique_counts = score_trace(logic["trace"], DEFAULT_WEIGHTS)
+        score, max_tech, single_ratio = metrics.score, metrics.max_technique, metrics.single_ratio
         if score < args.min_score:
             reason = "low_score"
-            rejects.append(
+            add_reject(
                 {
                     **base,
                     "clues": clues,
@@ -809,12 +1257,11 @@ def main() -> int:
                     "reject_reason": reason,
                 }
             )
-            reject_counter[reason] += 1
             continue
 
         if single_ratio > args.max_single_ratio:
             reason = "too_many_singles"
-            rejects.append(
+            add_reject(
                 {
                     **base,
                     "clues": clues,
@@ -826,7 +1273,6 @@ def main() -> int:
                     "reject_reason": reason,
                 }
             )
-            reject_counter[reason] += 1
             continue
 
         record = {
@@ -834,20 +1280,23 @@ def main() -> int:
             "clues": clues,
             "solution_count": sol_count,
             "is_unique": (sol_count == 1) if args.require_unique else None,
+            "search_nodes": search_nodes,
             "is_logic_solvable": True,
             "difficulty_score": score,
             "max_technique": max_tech,
             "single_ratio": round(single_ratio, 4),
-            "technique_counts": dict(sorted(technique_counts.items())),
-            "solve_trace": logic["trace"],
+            "technique_counts": dict(sorted(metrics.technique_counts.items())),
+            # Only candidates keep a trace; the cache stores it next to the metrics.
+            "solve_trace": solve_trace(puzzle, allowed, DEFAULT_WEIGHTS, cache=logic_cache),
             "puzzle": puzzle,
+            "solution": search.solution if search is not None else None,
         }
-        candidates.append(record)
-        clue_counter[clues] += 1
+        add_candidate(record)
 
-    if args.target_count and len(candidates) > args.target_count:
+    keep_ids = None
+    if args.target_count and len(summaries) > args.target_count:
         ranked = sorted(
-            candidates,
+            summaries,
             key=lambda x: (
                 -x["difficulty_score"],
                 x["single_ratio"],
@@ -856,31 +1305,38 @@ def main() -> int:
             ),
         )
         keep_ids = {c["id"] for c in ranked[: args.target_count]}
-        kept = []
-        trimmed = []
-        for c in candidates:
-            if c["id"] in keep_ids:
-                kept.append(c)
-            else:
+        for c in summaries:
+            if c["id"] not in keep_ids:
                 item = {k: c[k] for k in ("id", "displayName", "clues", "difficulty_score")}
                 item["reject_reason"] = "target_trim"
-                trimmed.append(item)
-                reject_counter["target_trim"] += 1
-        candidates = kept
-        rejects.extend(trimmed)
-        clue_counter = Counter(c["clues"] for c in candidates)
-
-    report = make_report_md(len(levels), candidates, rejects, clue_counter, reject_counter)
-
-    candidates_path = out_dir / "nirvana_candidates.json"
-    rejects_path = out_dir / "nirvana_rejects.json"
-    report_path = out_dir / "nirvana_report.md"
-
-    candidates_path.write_text(json.dumps(candidates, ensure_ascii=False, indent=2), encoding="utf-8")
-    rejects_path.write_text(json.dumps(rejects, ensure_ascii=False, indent=2), encoding="utf-8")
+                add_reject(item)
+        candidates = [c for c in candidates if c["id"] in keep_ids]
+        summaries = [c for c in summaries if c["id"] in keep_ids]
+        clue_counter = Counter(c["clues"] for c in summaries)
+
+    report = make_report_md(
+        len(levels),
+        summaries,
+        sum(reject_counter.values()),
+        clue_counter,
+        reject_counter,
+        prefilter_counter if args.singles_prefilter else None,
+        logic_cache.summary() if logic_cache is not None else None,
+    )
+    if logic_cache is not None:
+        logic_cache.close()
+
+    if candidate_stream is not None and reject_stream is not None:
+        candidate_stream.close()
+        reject_stream.close()
+        if keep_ids is not None:
+            keep_jsonl_ids(candidates_path, keep_ids)
+    else:
+        candidates_path.write_text(json.dumps(candidates, ensure_ascii=False, indent=2), encoding="utf-8")
+        rejects_path.write_text(json.dumps(rejects, ensure_ascii=False, indent=2), encoding="utf-8")
     report_path.write_text(report, encoding="utf-8")
 
-    print(f"Done. candidates={len(candidates)} rejects={len(rejects)}")
+    print(f"Done. candidates={len(summaries)} rejects={sum(reject_counter.values())}")
     print(f"- {candidates_path}")
     print(f"- {rejects_path}")
     print(f"- {report_path}")
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Fixed-width binary format for puzzle pools (.npool), with an mmap reader.
+
+A pool file is a small header followed by equal-sized records, so record i
+sits at a known offset and the record count follows from the file size
+(files can be appended to). Each record holds:
+  puzzle, solution       41 bytes each, pack_puzzle() nibbles
+  clues, flags           uint8, uint8
+  max_technique          uint8 index into the header's technique list (255 = none)
+  id, difficulty_score   int32, int32
+  single_ratio           float32
+  search_nodes           int64
+  technique_counts       uint16 per technique in the header list
+Display fields (stars, difficultyName, displayName) are not stored.
+
+Convert either way (direction follows the file suffixes):
+  python pool_format.py out_nirvana_gen/nirvana_stage1_pool.json pool.npool
+  python pool_format.py pool.npool pool.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import struct
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+from nirvana_filter import DEFAULT_WEIGHTS
+from sudoku_canon import pack_puzzle, unpack_puzzle
+
+
+POOL_SUFFIX = ".npool"
+MAGIC = b"NPOOL\x00\x00\x01"
+HEADER = struct.Struct("<8sHH")
+NO_TECHNIQUE = 255
+
+HAS_SOLUTION = 1
+HAS_METRICS = 2
+HAS_ID = 4
+HAS_NODES = 8
+
+EMPTY_GRID = bytes(41)
+
+
+def record_struct(n_techniques: int) -> struct.Struct:
+    return struct.Struct(f"<41s41sBBBiifq{n_techniques}H")
+
+
+def encode_record(rec: struct.Struct, techniques: Sequence[str], item: dict) -> bytes:
+    flags = 0
+    solution = item.get("solution")
+    if solution:
+        flags |= HAS_SOLUTION
+    if "difficulty_score" in item:
+        flags |= HAS_METRICS
+    if item.get("id") is not None:
+        flags |= HAS_ID
+    if item.get("search_nodes") is not None:
+        flags |= HAS_NODES
+    counts = item.get("technique_counts") or {}
+    unknown = set(counts) - set(techniques)
+    if unknown:
+        raise ValueError(f"techniques not in the pool header: {sorted(unknown)}")
+    max_tech = item.get("max_technique", "none")
+    # "none" and labels outside the header list (e.g. "unknown" from generate_transcendent_levels) read back as "none".
+    max_idx = techniques.index(max_tech) if max_tech in techniques else NO_TECHNIQUE
+    return rec.pack(
+        pack_puzzle(item["puzzle"]),
+        pack_puzzle(solution) if solution else EMPTY_GRID,
+        item.get("clues", sum(1 for v in item["puzzle"] if v)),
+        flags,
+        max_idx,
+        item.get("id") or 0,
+        item.get("difficulty_score", 0),
+        item.get("single_ratio", 0.0),
+        item.get("search_nodes") if flags & HAS_NODES else -1,
+        *(counts.get(t, 0) for t in techniques),
+    )
+
+
+def decode_record(rec: struct.Struct, techniques: Sequence[str], raw: bytes) -> dict:
+    puzzle, solution, clues, flags, max_idx, level_id, score, ratio, nodes, *counts = rec.unpack(raw)
+    item: dict = {}
+    if flags & HAS_ID:
+        item["id"] = level_id
+    item["clues"] = clues
+    item["puzzle"] = unpack_puzzle(puzzle)
+    if flags & HAS_SOLUTION:
+        item["solution"] = unpack_puzzle(solution)
+    if flags & HAS_METRICS:
+        item["difficulty_score"] = score
+        item["max_technique"] = "none" if max_idx == NO_TECHNIQUE else techniques[max_idx]
+        item["single_ratio"] = round(ratio, 4)
+        item["technique_counts"] = {t: c for t, c in sorted(zip(techniques, counts)) if c}
+    if flags & HAS_NODES:
+        item["search_nodes"] = nodes
+    return item
+
+
+def encode_header(techniques: Sequence[str]) -> bytes:
+    names = ",".join(techniques).encode("ascii")
+    return HEADER.pack(MAGIC, len(techniques), len(names)) + names
+
+
+def read_header(data: bytes) -> tuple:
+    """(techniques, offset of the first record)."""
+    magic, n_tech, names_len = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not an .npool file")
+    names = data[HEADER.size : HEADER.size + names_len].decode("ascii")
+    techniques = names.split(",") if names else []
+    if len(techniques) != n_tech:
+        raise ValueError("corrupt .npool header")
+    return techniques, HEADER.size + names_len
+
+
+class PoolWriter:
+    """Appends records; creates the file (and header) if it does not exist yet."""
+
+    def __init__(self, path: Path, techniques: Optional[Sequence[str]] = None) -> None:
+        self.path = path
+        if path.exists() and path.stat().st_size > 0:
+            with path.open("rb") as f:
+                self.techniques = read_header(f.read(HEADER.size + 4096))[0]
+            self._f = path.open("ab")
+        else:
+            self.techniques = list(techniques or DEFAULT_WEIGHTS)
+            self._f = path.open("wb")
+            self._f.write(encode_header(self.techniques))
+        self._rec = record_struct(len(self.techniques))
+        self.written = 0
+
+    def append(self, item: dict) -> None:
+        self._f.write(encode_record(self._rec, self.techniques, item))
+        self.written += 1
+
+    def extend(self, items: Sequence[dict]) -> None:
+        for item in items:
+            self.append(item)
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "PoolWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class PoolReader:
+    """Random access by index over an mmap of the file; len() follows the file size."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._f = path.open("rb")
+        if path.stat().st_size == 0:
+            # mmap cannot map an empty file; treat it like a pool with no records.
+            self._mm = b""
+            self.techniques, self._offset = [], 0
+        else:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.techniques, self._offset = read_header(self._mm[: HEADER.size + 4096])
+        self._rec = record_struct(len(self.techniques))
+        self._len = (len(self._mm) - self._offset) // self._rec.size
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _raw(self, index: int) -> bytes:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError(index)
+        start = self._offset + index * self._rec.size
+        return self._mm[start : start + self._rec.size]
+
+    def __getitem__(self, index: int) -> dict:
+        return decode_record(self._rec, self.techniques, self._raw(index))
+
+    def __iter__(self) -> Iterator[dict]:
+        for i in range(self._len):
+            yield self[i]
+
+    def puzzles(self) -> Iterator[List[int]]:
+        """Scan only the puzzle field of every record."""
+        step = self._rec.size
+        for start in range(self._offset, self._offset + self._len * step, step):
+            yield unpack_puzzle(self._mm[start : start + 41])
+
+    def close(self) -> None:
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._f.close()
+
+    def __enter__(self) -> "PoolReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_pool(path: Path) -> List[dict]:
+    with PoolReader(path) as reader:
+        return list(reader)
+
+
+def write_pool(path: Path, items: Sequence[dict], techniques: Optional[Sequence[str]] = None) -> None:
+    """Write `items` as a fresh pool file (replaces any existing file)."""
+    path.unlink(missing_ok=True)
+    with PoolWriter(path, techniques) as writer:
+        writer.extend(items)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Convert puzzle pools between JSON and .npool.")
+    parser.add_argument("input", help=".json or .npool")
+    parser.add_argument("output", help=".npool or .json")
+    args = parser.parse_args()
+
+    src, dst = Path(args.input), Path(args.output)
+    if src.suffix == POOL_SUFFIX:
+        items = read_pool(src)
+        dst.write_text(json.dumps(items, ensure_ascii=False, indent=2), encoding="utf-8")
+    else:
+        items = json.loads(src.read_text(encoding="utf-8"))
+        write_pool(dst, items)
+    print(f"{src} -> {dst}: {len(items)} records ({src.stat().st_size} -> {dst.stat().st_size} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,6 +6,7 @@ Usage:
   python run_nirvana_preset.py 1
   python run_nirvana_preset.py 2 --targets 17:3,18:4,19:5
   python run_nirvana_preset.py 3 --output out_nirvana_batch_mad
+  python run_nirvana_preset.py 3 --output out_nirvana_batch_mad --resume
 """
 
 from __future__ import annotations
@@ -109,6 +110,8 @@ def build_command(args: argparse.Namespace) -> List[str]:
 
     for k, v in merged.items():
         cmd.extend([f"--{k}", v])
+    if args.resume:
+        cmd.append("--resume")
 
     return cmd
 
@@ -122,6 +125,7 @@ def main() -> int:
     parser.add_argument("--runs", type=int, default=None)
     parser.add_argument("--seed-start", type=int, default=None)
     parser.add_argument("--seed-step", type=int, default=None)
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted batch in the same output dir.")
     parser.add_argument("--dry-run", action="store_true")
     args = parser.parse_args()
 
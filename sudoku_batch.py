@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Vectorized passes over many puzzles at once (requires numpy).
+
+Puzzles are an (N, 81) uint8 array, 0 for blanks. Per-row work is done for
+all rows together:
+- clue_counts / candidate_masks / candidate_entropy
+- propagate_singles: naked + hidden singles to a fixpoint on every row
+- batch_search: rows closed by singles are answered directly; only the
+  unresolved rows fall back to sudoku_solver.search one at a time.
+
+Usage:
+  python sudoku_batch.py --input external_data/puzzles2_17_clue.txt
+  python sudoku_batch.py --input levels.js --skip-search
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from sudoku_solver import DEFAULT_BACKEND, SearchResult, search
+
+
+ALL_DIGITS = 0x1FF
+DIGIT_TO_BIT = np.array([0] + [1 << d for d in range(9)], dtype=np.uint16)
+DIGIT_BITS = np.array([1 << d for d in range(9)], dtype=np.uint16)
+POPCOUNT = np.array([bin(m).count("1") for m in range(512)], dtype=np.uint8)
+SINGLE_DIGIT = np.array([m.bit_length() if bin(m).count("1") == 1 else 0 for m in range(512)], dtype=np.uint8)
+
+ROW_OF = np.arange(81) // 9
+COL_OF = np.arange(81) % 9
+BOX_OF = (ROW_OF // 3) * 3 + COL_OF // 3
+BOX_CELLS = np.array([[c for c in range(81) if BOX_OF[c] == b] for b in range(9)])
+UNIT_CELLS = np.concatenate([np.arange(81).reshape(9, 9), np.arange(81).reshape(9, 9).T, BOX_CELLS])
+
+
+def to_array(puzzles: Sequence[Sequence[int]]) -> np.ndarray:
+    return np.asarray(puzzles, dtype=np.uint8).reshape(-1, 81)
+
+
+def clue_counts(grids: np.ndarray) -> np.ndarray:
+    return (grids != 0).sum(axis=1)
+
+
+def unit_used(grids: np.ndarray) -> np.ndarray:
+    """(N, 27) masks of the digits placed in each row, column and box."""
+    bits = DIGIT_TO_BIT[grids]
+    rows = np.bitwise_or.reduce(bits.reshape(-1, 9, 9), axis=2)
+    cols = np.bitwise_or.reduce(bits.reshape(-1, 9, 9), axis=1)
+    boxes = np.bitwise_or.reduce(bits[:, BOX_CELLS], axis=2)
+    return np.concatenate([rows, cols, boxes], axis=1)
+
+
+def givens_consistent(grids: np.ndarray, used: Optional[np.ndarray] = None) -> np.ndarray:
+    """A unit is consistent when its clue count equals the number of distinct digits in it."""
+    if used is None:
+        used = unit_used(grids)
+    filled = (grids[:, UNIT_CELLS] != 0).sum(axis=2)
+    return (POPCOUNT[used] == filled).all(axis=1)
+
+
+def candidate_masks(grids: np.ndarray, used: Optional[np.ndarray] = None) -> np.ndarray:
+    """(N, 81) 9-bit candidate masks; filled cells hold 0."""
+    if used is None:
+        used = unit_used(grids)
+    peers_used = used[:, ROW_OF] | used[:, 9 + COL_OF] | used[:, 18 + BOX_OF]
+    return np.where(grids == 0, ALL_DIGITS & ~peers_used, 0).astype(np.uint16)
+
+
+def candidate_entropy(grids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per row: total and max candidate count over the blank cells."""
+    counts = POPCOUNT[candidate_masks(grids)]
+    return counts.sum(axis=1, dtype=np.int64), counts.max(axis=1)
+
+
+def _unit_digit_cells(masks: np.ndarray) -> np.ndarray:
+    """(N, 27, 9 cells, 9 digits) bool: cell k of unit u can still take digit d."""
+    return (masks[:, UNIT_CELLS][..., None] & DIGIT_BITS) != 0
+
+
+def initial_singles(grids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per row: whether a naked single / a hidden single is available right away."""
+    masks = candidate_masks(grids)
+    has_naked = (POPCOUNT[masks] == 1).any(axis=1)
+    has_hidden = (_unit_digit_cells(masks).sum(axis=2) == 1).any(axis=(1, 2))
+    return has_naked, has_hidden
+
+
+def _singles_round(grids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Place every naked and hidden single visible now, in place. Returns (changed, contradiction)."""
+    used = unit_used(grids)
+    masks = candidate_masks(grids, used)
+    bad = ~givens_consistent(grids, used)
+    bad |= ((grids == 0) & (masks == 0)).any(axis=1)
+    possible = np.bitwise_or.reduce(masks[:, UNIT_CELLS], axis=2)
+    bad |= ((possible | used) != ALL_DIGITS).any(axis=1)
+
+    place = SINGLE_DIGIT[masks]
+    onehot = _unit_digit_cells(masks)
+    rows, units, digits = np.nonzero(onehot.sum(axis=2) == 1)
+    slots = onehot[rows, units, :, digits].argmax(axis=1)
+    # A cell claimed twice with different digits leaves a hole that the next round reports.
+    place[rows, UNIT_CELLS[units, slots]] = digits + 1
+    place[bad] = 0
+
+    changed = (place != 0).any(axis=1)
+    np.copyto(grids, place, where=place != 0)
+    return changed, bad
+
+
+@dataclass
+class SinglesResult:
+    grids: np.ndarray  # (N, 81) boards after singles propagation
+    solved: np.ndarray  # closed by singles alone
+    invalid: np.ndarray  # inconsistent givens or contradiction found by singles
+    placed: np.ndarray  # cells filled by singles
+    rounds: int
+
+
+def propagate_singles(grids: np.ndarray, chunk_size: int = 4096) -> SinglesResult:
+    out = np.array(grids, dtype=np.uint8, copy=True).reshape(-1, 81)
+    invalid = np.zeros(len(out), dtype=bool)
+    active = np.ones(len(out), dtype=bool)
+    rounds = 0
+    # Each productive round fills at least one cell, so 81 rounds always reach the fixpoint.
+    while active.any() and rounds <= 81:
+        rounds += 1
+        todo = np.nonzero(active)[0]
+        for start in range(0, len(todo), chunk_size):
+            rows = todo[start : start + chunk_size]
+            chunk = out[rows]
+            changed, bad = _singles_round(chunk)
+            out[rows] = chunk
+            invalid[rows[bad]] = True
+            active[rows] = changed & ~bad
+    solved = ~invalid & (out != 0).all(axis=1)
+    placed = clue_counts(out) - clue_counts(np.asarray(grids).reshape(-1, 81))
+    return SinglesResult(grids=out, solved=solved, invalid=invalid, placed=placed, rounds=rounds)
+
+
+def batch_search(
+    grids: np.ndarray,
+    limit: int = 2,
+    backend: str = DEFAULT_BACKEND,
+    singles: Optional[SinglesResult] = None,
+) -> List[SearchResult]:
+    """
+    sudoku_solver.search for every row. Rows closed by singles are unique by
+    construction and rows with a contradiction have no solution; only the rest
+    are searched, starting from their propagated board.
+    """
+    if singles is None:
+        singles = propagate_singles(grids)
+    results: List[SearchResult] = []
+    for i in range(len(singles.grids)):
+        if singles.invalid[i]:
+            results.append(SearchResult(count=0, solution=None, nodes=0, backtracks=0))
+        elif singles.solved[i]:
+            results.append(SearchResult(count=1, solution=singles.grids[i].tolist(), nodes=0, backtracks=0))
+        else:
+            results.append(search(singles.grids[i].tolist(), limit=limit, backend=backend))
+    return results
+
+
+def singles_logic_metrics(
+    grids: np.ndarray,
+    allowed_techniques: Sequence[str],
+    weights: Dict[str, int],
+    singles: Optional[SinglesResult] = None,
+) -> List[Optional[Tuple[int, str, float]]]:
+    """
+    (score, max_technique, single_ratio) that logic_solve + score_trace would
+    report for rows closed by singles alone, None for every other row.
+
+    Singles are confluent, so logic_solve places exactly the blank cells and
+    never reaches a later technique; the first step (and thus max_technique,
+    since both singles share a weight) is whichever single technique comes
+    first in the allowed order and is available on the initial board.
+    """
+    if singles is None:
+        singles = propagate_singles(grids)
+    names = list(allowed_techniques[:2])
+    w = weights.get("naked_single", 1)
+    if set(names) != {"naked_single", "hidden_single"} or weights.get("hidden_single", 1) != w:
+        return [None] * len(singles.grids)
+
+    has_naked, has_hidden = initial_singles(grids)
+    available = {"naked_single": has_naked, "hidden_single": has_hidden}
+    out: List[Optional[Tuple[int, str, float]]] = []
+    for i in range(len(singles.grids)):
+        if not singles.solved[i]:
+            out.append(None)
+            continue
+        blanks = int(singles.placed[i])
+        if blanks == 0:
+            out.append((0, "none", 0.0))
+            continue
+        first = names[0] if available[names[0]][i] else names[1]
+        out.append((blanks * w, first, 1.0))
+    return out
+
+
+def load_puzzle_array(path: Path, max_puzzles: int = 0) -> np.ndarray:
+    if path.suffix.lower() == ".txt":
+        from import_17clue_dataset import parse_puzzle_line
+
+        puzzles: List[List[int]] = []
+        with path.open("r", encoding="utf-8") as f:
+            for raw in f:
+                raw = raw.rstrip("\n")
+                if not raw or raw.startswith("#"):
+                    continue
+                puzzle = parse_puzzle_line(raw)
+                if puzzle is not None:
+                    puzzles.append(puzzle)
+    else:
+        from nirvana_filter import load_levels
+
+        puzzles = [lv["puzzle"] for lv in load_levels(path) if isinstance(lv.get("puzzle"), list)]
+    if max_puzzles:
+        puzzles = puzzles[:max_puzzles]
+    return to_array(puzzles)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Batched singles/uniqueness pass over a puzzle file.")
+    parser.add_argument("--input", default="external_data/puzzles2_17_clue.txt", help=".txt dataset, levels.js or .json")
+    parser.add_argument("--max-puzzles", type=int, default=0, help="0 means the whole file")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, help="Fallback search backend for unresolved rows.")
+    parser.add_argument("--skip-search", action="store_true", help="Only run the vectorized singles pass.")
+    args = parser.parse_args()
+
+    grids = load_puzzle_array(Path(args.input), args.max_puzzles)
+    t0 = time.perf_counter()
+    singles = propagate_singles(grids)
+    t_singles = time.perf_counter() - t0
+
+    clues = Counter(clue_counts(grids).tolist())
+    n = len(grids)
+    n_solved = int(singles.solved.sum())
+    n_invalid = int(singles.invalid.sum())
+    print(f"puzzles={n} clue_distribution={dict(sorted(clues.items()))}")
+    print(f"singles pass: {t_singles:.2f}s rounds={singles.rounds}")
+    print(f"- closed by singles: {n_solved}")
+    print(f"- contradiction: {n_invalid}")
+    print(f"- needs search: {n - n_solved - n_invalid}")
+
+    if not args.skip_search:
+        t0 = time.perf_counter()
+        results = batch_search(grids, limit=2, backend=args.backend, singles=singles)
+        t_search = time.perf_counter() - t0
+        counts = Counter(min(r.count, 2) for r in results)
+        print(f"uniqueness pass: {t_search:.2f}s")
+        print(f"- unique: {counts[1]}")
+        print(f"- no solution: {counts[0]}")
+        print(f"- multiple solutions: {counts[2]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
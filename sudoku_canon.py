@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Minlex canonical form of a Sudoku puzzle.
+
+Two puzzles are isomorphic when one becomes the other by some mix of:
+band / stack permutations, row permutations inside a band, column
+permutations inside a stack, transposition and relabelling of the digits.
+All isomorphs share solution counts, and the tools here treat them as one
+puzzle for dedupe and caching. The canonical representative is the
+lexicographically smallest 81-digit string over the whole group (blanks
+are 0, so clues are pushed towards the end), with digits relabelled 1, 2, 3...
+in order of first appearance.
+
+puzzle_key(puzzle, canonical=True) is what the generators use when run with
+--canonical-keys.
+
+minlex() builds the answer row by row and only keeps the partial
+transforms whose rows so far equal the best prefix, so most of the
+2 * 6^8 row/column arrangements are never looked at.
+
+Usage:
+  python sudoku_canon.py --input levels.js
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+from collections import Counter
+from itertools import permutations, product
+from operator import or_
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+
+TRIPLE_ORDERS = list(permutations(range(3)))
+# Every column arrangement allowed by the group: stack order, then the column order inside each stack.
+COL_PERMS: List[Tuple[int, ...]] = [
+    tuple(3 * stack + inner[k][j] for k, stack in enumerate(stacks) for j in range(3))
+    for stacks in TRIPLE_ORDERS
+    for inner in product(TRIPLE_ORDERS, repeat=3)
+]
+
+# An isomorphism as applied by transform(): source cell of each output cell, and the digit relabelling.
+Transform = Tuple[Tuple[int, ...], Tuple[int, ...]]
+
+# A partial transform: (grid, column permutation, rows placed so far, digit labels, next label).
+_State = Tuple[int, Tuple[int, ...], Tuple[int, ...], Tuple[int, ...], int]
+
+
+def _rows(puzzle: Sequence[int]) -> List[Tuple[int, ...]]:
+    return [tuple(puzzle[r * 9 : r * 9 + 9]) for r in range(9)]
+
+
+def _relabel(values: Sequence[int], labels: Tuple[int, ...], nxt: int) -> Tuple[Tuple[int, ...], Tuple[int, ...], int]:
+    """Relabel one row; digits not seen yet get the next free labels, left to right."""
+    out = []
+    new_labels = None
+    for v in values:
+        if v == 0:
+            out.append(0)
+            continue
+        lab = labels[v] if new_labels is None else new_labels[v]
+        if lab == 0:
+            if new_labels is None:
+                new_labels = list(labels)
+            lab = new_labels[v] = nxt
+            nxt += 1
+        out.append(lab)
+    return tuple(out), labels if new_labels is None else tuple(new_labels), nxt
+
+
+def _clue_mask(row: Sequence[int], cp: Sequence[int]) -> int:
+    """Clue positions of the permuted row as a 9-bit number, first column highest."""
+    return sum(256 >> j for j, c in enumerate(cp) if row[c])
+
+
+def _best_clue_mask(row: Sequence[int]) -> int:
+    # Fewest clues in the first stack, and blanks before clues inside each stack.
+    counts = sorted(sum(1 for v in row[3 * s : 3 * s + 3] if v) for s in range(3))
+    return sum(((1 << k) - 1) << (6 - 3 * i) for i, k in enumerate(counts))
+
+
+def _first_row_states(grids: Sequence[List[Tuple[int, ...]]]) -> List[_State]:
+    """
+    Row 0 after relabelling is fixed by where its clues sit (they become
+    1, 2, 3...), so the best first row is the one with the smallest clue
+    mask. Only transforms reaching that mask are kept.
+    """
+    empty_labels = (0,) * 10
+    best = min(_best_clue_mask(row) for grid in grids for row in grid)
+    states: List[_State] = []
+    for g, grid in enumerate(grids):
+        for r, row in enumerate(grid):
+            if _best_clue_mask(row) != best:
+                continue
+            for cp in COL_PERMS:
+                if _clue_mask(row, cp) == best:
+                    _, labels, nxt = _relabel([row[c] for c in cp], empty_labels, 1)
+                    states.append((g, cp, (r,), labels, nxt))
+    return states
+
+
+def minlex(puzzle: Sequence[int]) -> List[int]:
+    """The canonical representative of `puzzle` as a flat list of 81 ints."""
+    rows = _rows(puzzle)
+    grids = (rows, [tuple(rows[r][c] for r in range(9)) for c in range(9)])
+    states = _first_row_states(grids)
+    g, cp, used, _, _ = states[0]
+    out: List[int] = list(_relabel([grids[g][used[0]][c] for c in cp], (0,) * 10, 1)[0])
+
+    for p in range(1, 9):
+        best = None
+        survivors: List[_State] = []
+        for g, cp, used, labels, nxt in states:
+            if p % 3 == 0:
+                taken = {r // 3 for r in used}
+                choices = [r for r in range(9) if r // 3 not in taken]
+            else:
+                band = used[-1] // 3
+                choices = [r for r in range(3 * band, 3 * band + 3) if r not in used]
+            grid = grids[g]
+            for r in choices:
+                row = grid[r]
+                values, new_labels, new_nxt = _relabel([row[c] for c in cp], labels, nxt)
+                if best is None or values < best:
+                    best = values
+                    survivors = []
+                if values == best:
+                    survivors.append((g, cp, used + (r,), new_labels, new_nxt))
+        out.extend(best)
+        states = survivors
+    return out
+
+
+def canonical_key(puzzle: Sequence[int]) -> str:
+    """81-char minlex string: equal for all isomorphs of a puzzle."""
+    return "".join(map(str, minlex(puzzle)))
+
+
+def random_transform(rng: random.Random) -> Transform:
+    """A uniformly random element of the symmetry group."""
+    order = []
+    for _ in range(2):
+        lines: List[int] = []
+        for block in rng.sample(range(3), 3):
+            lines.extend(3 * block + i for i in rng.sample(range(3), 3))
+        order.append(lines)
+    rows, cols = order
+    if rng.random() < 0.5:
+        cells = tuple(cols[c] * 9 + rows[r] for r in range(9) for c in range(9))
+    else:
+        cells = tuple(rows[r] * 9 + cols[c] for r in range(9) for c in range(9))
+    return cells, (0, *rng.sample(range(1, 10), 9))
+
+
+def transform(grid: Sequence[int], t: Transform) -> List[int]:
+    """Apply `t` to a puzzle or solution grid; blanks stay 0."""
+    cells, digits = t
+    return [digits[grid[src]] for src in cells]
+
+
+def puzzle_key(puzzle: Sequence[int], canonical: bool = False) -> str:
+    """Dedupe/cache key: the raw 81 digits, or the minlex form when `canonical`."""
+    if canonical:
+        return canonical_key(puzzle)
+    return "".join(map(str, puzzle))
+
+
+_HIGH_NIBBLE = [v << 4 for v in range(10)]
+PACKED_SIZE = 41
+
+
+def pack_puzzle(puzzle: Sequence[int]) -> bytes:
+    """41-byte key: two cells per byte, high nibble first; r9c9 sits alone in the last byte."""
+    return bytes(map(or_, map(_HIGH_NIBBLE.__getitem__, puzzle[0::2]), [*puzzle[1::2], 0]))
+
+
+def unpack_puzzle(packed: bytes) -> List[int]:
+    out: List[int] = []
+    for b in packed:
+        out += (b >> 4, b & 15)
+    return out[:81]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Count isomorph groups in a level file.")
+    parser.add_argument("--input", default="levels.js", help="levels.js or .json")
+    args = parser.parse_args()
+
+    from nirvana_filter import load_levels
+
+    puzzles = [lv["puzzle"] for lv in load_levels(Path(args.input)) if isinstance(lv.get("puzzle"), list)]
+    groups = Counter(canonical_key(p) for p in puzzles)
+    repeated = {k: n for k, n in groups.items() if n > 1}
+    print(f"puzzles={len(puzzles)} distinct_raw={len({tuple(p) for p in puzzles})} isomorph_groups={len(groups)}")
+    print(f"groups with more than one member: {len(repeated)} ({sum(repeated.values())} puzzles)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,653 @@
+#!/usr/bin/env python3
+"""
+Shared brute-force Sudoku solver used by every tool in this repo.
+
+Public API (boards are flat lists of 81 ints, 0 for blanks):
+- count(board, limit=2)       number of solutions, capped at `limit`
+- solve(board)                first solution grid or None
+- solve_with_stats(board)     (first solution or None, SearchStats)
+- search(board, limit=2)      SearchResult: count, first solution, nodes and
+                              backtracks from a single pass
+- is_unique(board)            exactly one solution
+- uniqueness(board, budget)   UNIQUE / NOT_UNIQUE / UNKNOWN, where UNKNOWN
+                              means the SearchBudget ran out first
+
+Every call takes `backend=`, and count/search/uniqueness take an optional
+`budget=SearchBudget(max_nodes=..., max_seconds=...)` that stops the search
+early; an exhausted search is reported through SearchStats.aborted and
+SearchResult.complete.
+
+Backends:
+- bitmask (default): DFS over row/column/box used-digit masks that runs naked
+  and hidden singles propagation at every node before branching on the MRV cell.
+- dlx: Algorithm X over the 324-column exact-cover matrix, with dancing links
+  stored in flat arrays (one template built at import, copied per search).
+- dfs: plain MRV backtracking without propagation, kept as a reference.
+
+Usage:
+  python sudoku_solver.py 53..7....6..195....98....6.8...6...34..8.3..17...2...6.6....28....419..5....8..79
+  python sudoku_solver.py <puzzle> --backend dlx --limit 10
+  python sudoku_solver.py <puzzle> --max-nodes 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+
+@dataclass
+class SearchStats:
+    nodes: int = 0  # branch digits tried
+    backtracks: int = 0  # dead ends reached (no candidate left / contradiction)
+    aborted: int = 0  # searches cut short by their SearchBudget
+
+
+@dataclass
+class SearchResult:
+    count: int  # capped at the search limit
+    solution: Optional[List[int]]  # first solution found
+    nodes: int
+    backtracks: int
+    complete: bool = True  # False when the budget ran out before `limit` was reached
+
+
+@dataclass
+class SearchBudget:
+    """Upper bound for a single search; 0 disables that limit."""
+
+    max_nodes: int = 0
+    max_seconds: float = 0.0
+
+
+UNIQUE = "unique"
+NOT_UNIQUE = "not_unique"
+UNKNOWN = "unknown"
+
+
+def _box_of(r: int, c: int) -> int:
+    return (r // 3) * 3 + c // 3
+
+
+def _build_peers() -> List[Set[int]]:
+    peers = []
+    for idx in range(81):
+        r, c = divmod(idx, 9)
+        p = set(r * 9 + j for j in range(9)) | set(i * 9 + c for i in range(9))
+        br, bc = (r // 3) * 3, (c // 3) * 3
+        p |= set((br + dr) * 9 + (bc + dc) for dr in range(3) for dc in range(3))
+        p.remove(idx)
+        peers.append(p)
+    return peers
+
+
+PEERS = _build_peers()
+
+
+def _budget_check(budget: Optional[SearchBudget]) -> Optional[Callable[[int], bool]]:
+    """Return over(nodes) -> True once the budget is spent, or None when unlimited."""
+    if budget is None or (budget.max_nodes <= 0 and budget.max_seconds <= 0):
+        return None
+    max_nodes = budget.max_nodes
+    deadline = time.perf_counter() + budget.max_seconds if budget.max_seconds > 0 else 0.0
+
+    def over(nodes: int) -> bool:
+        if max_nodes > 0 and nodes > max_nodes:
+            return True
+        # The clock is only read every 64 nodes.
+        return deadline > 0 and nodes & 63 == 0 and time.perf_counter() > deadline
+
+    return over
+
+
+def givens_consistent(board: Sequence[int]) -> bool:
+    row_used = [0] * 9
+    col_used = [0] * 9
+    box_used = [0] * 9
+    for idx, v in enumerate(board):
+        if v == 0:
+            continue
+        bit = 1 << v
+        r, c = divmod(idx, 9)
+        b = _box_of(r, c)
+        if row_used[r] & bit or col_used[c] & bit or box_used[b] & bit:
+            return False
+        row_used[r] |= bit
+        col_used[c] |= bit
+        box_used[b] |= bit
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Plain MRV DFS
+# ---------------------------------------------------------------------------
+
+
+def dfs_search(
+    board: Sequence[int],
+    limit: int = 2,
+    stats: Optional[SearchStats] = None,
+    solution_out: Optional[List[int]] = None,
+    budget: Optional[SearchBudget] = None,
+) -> int:
+    if not givens_consistent(board):
+        return 0
+    grid = list(board)
+    over = _budget_check(budget)
+    solutions = 0
+    nodes = 0
+    backtracks = 0
+    aborted = False
+
+    def possible_values(idx: int) -> List[int]:
+        used = {grid[p] for p in PEERS[idx] if grid[p] != 0}
+        return [d for d in range(1, 10) if d not in used]
+
+    def choose_cell() -> Optional[Tuple[int, List[int]]]:
+        best_idx = None
+        best_vals: List[int] = []
+        for i in range(81):
+            if grid[i] != 0:
+                continue
+            vals = possible_values(i)
+            if len(vals) == 0:
+                return i, []
+            if best_idx is None or len(vals) < len(best_vals):
+                best_idx = i
+                best_vals = vals
+                if len(best_vals) == 1:
+                    break
+        if best_idx is None:
+            return None
+        return best_idx, best_vals
+
+    def dfs() -> None:
+        nonlocal solutions, nodes, backtracks, aborted
+        if solutions >= limit:
+            return
+        choice = choose_cell()
+        if choice is None:
+            solutions += 1
+            if solutions == 1 and solution_out is not None:
+                solution_out[:] = grid
+            return
+        idx, vals = choice
+        if not vals:
+            backtracks += 1
+            return
+        for d in vals:
+            nodes += 1
+            if over is not None and over(nodes):
+                aborted = True
+                return
+            grid[idx] = d
+            dfs()
+            grid[idx] = 0
+            if solutions >= limit or aborted:
+                return
+
+    dfs()
+    if stats is not None:
+        stats.nodes += nodes
+        stats.backtracks += backtracks
+        stats.aborted += aborted
+    return solutions
+
+
+# ---------------------------------------------------------------------------
+# Propagating bitmask DFS
+# ---------------------------------------------------------------------------
+
+ALL_DIGITS = 0x1FF
+CELL_ROW = [idx // 9 for idx in range(81)]
+CELL_COL = [idx % 9 for idx in range(81)]
+CELL_BOX = [_box_of(idx // 9, idx % 9) for idx in range(81)]
+# (kind, index, cells) for the 27 units; kind 0/1/2 = row/col/box.
+UNIT_TABLE = (
+    [(0, r, tuple(r * 9 + c for c in range(9))) for r in range(9)]
+    + [(1, c, tuple(r * 9 + c for r in range(9))) for c in range(9)]
+    + [
+        (2, b, tuple((b // 3 * 3 + dr) * 9 + b % 3 * 3 + dc for dr in range(3) for dc in range(3)))
+        for b in range(9)
+    ]
+)
+
+
+def _place(grid: List[int], used: List[List[int]], idx: int, bit: int) -> bool:
+    """Place the digit `bit` at idx; False if it clashes with the current state."""
+    rows, cols, boxes = used
+    r, c, b = CELL_ROW[idx], CELL_COL[idx], CELL_BOX[idx]
+    d = bit.bit_length()
+    if grid[idx] != 0:
+        return grid[idx] == d
+    if (rows[r] | cols[c] | boxes[b]) & bit:
+        return False
+    grid[idx] = d
+    rows[r] |= bit
+    cols[c] |= bit
+    boxes[b] |= bit
+    return True
+
+
+def _propagate(grid: List[int], used: List[List[int]]) -> Tuple[bool, int, int]:
+    """
+    Apply naked and hidden singles until neither fires.
+    Returns (consistent, branch_cell, branch_mask); branch_cell is -1 when solved.
+    """
+    rows, cols, boxes = used
+    unit_used = (rows, cols, boxes)
+    while True:
+        cand = [0] * 81
+        naked: List[Tuple[int, int]] = []
+        best_idx = -1
+        best_mask = 0
+        best_count = 10
+        for idx in range(81):
+            if grid[idx]:
+                continue
+            m = ALL_DIGITS & ~(rows[CELL_ROW[idx]] | cols[CELL_COL[idx]] | boxes[CELL_BOX[idx]])
+            if not m:
+                return False, -1, 0
+            if not m & (m - 1):
+                naked.append((idx, m))
+                continue
+            cand[idx] = m
+            if best_count > 2:
+                n = bin(m).count("1")
+                if n < best_count:
+                    best_idx, best_mask, best_count = idx, m, n
+        if naked:
+            for idx, bit in naked:
+                if not _place(grid, used, idx, bit):
+                    return False, -1, 0
+            continue
+        if best_idx < 0:
+            return True, -1, 0
+
+        hidden: List[Tuple[int, int]] = []
+        for kind, ui, cells in UNIT_TABLE:
+            once = 0
+            more = 0
+            for idx in cells:
+                m = cand[idx]
+                more |= once & m
+                once |= m
+            if (once | unit_used[kind][ui]) != ALL_DIGITS:
+                return False, -1, 0
+            singles = once & ~more
+            while singles:
+                bit = singles & -singles
+                singles ^= bit
+                for idx in cells:
+                    if cand[idx] & bit:
+                        hidden.append((idx, bit))
+                        break
+        if not hidden:
+            return True, best_idx, best_mask
+        for idx, bit in hidden:
+            if not _place(grid, used, idx, bit):
+                return False, -1, 0
+
+
+def bitmask_search(
+    board: Sequence[int],
+    limit: int = 2,
+    stats: Optional[SearchStats] = None,
+    solution_out: Optional[List[int]] = None,
+    budget: Optional[SearchBudget] = None,
+) -> int:
+    """
+    Count solutions up to `limit` with singles propagation at every node.
+    If `solution_out` is given, it receives the first solution found.
+    """
+    grid = [0] * 81
+    used = [[0] * 9, [0] * 9, [0] * 9]
+    for idx, v in enumerate(board):
+        if v != 0 and not _place(grid, used, idx, 1 << (v - 1)):
+            return 0
+
+    over = _budget_check(budget)
+    solutions = 0
+    nodes = 0
+    backtracks = 0
+    aborted = False
+
+    def search(grid: List[int], used: List[List[int]]) -> None:
+        nonlocal solutions, nodes, backtracks, aborted
+        ok, idx, m = _propagate(grid, used)
+        if not ok:
+            backtracks += 1
+            return
+        if idx < 0:
+            solutions += 1
+            if solutions == 1 and solution_out is not None:
+                solution_out[:] = grid
+            return
+        while m:
+            bit = m & -m
+            m ^= bit
+            nodes += 1
+            if over is not None and over(nodes):
+                aborted = True
+                return
+            child_grid = grid[:]
+            child_used = [used[0][:], used[1][:], used[2][:]]
+            _place(child_grid, child_used, idx, bit)
+            search(child_grid, child_used)
+            if solutions >= limit or aborted:
+                return
+
+    search(grid, used)
+    if stats is not None:
+        stats.nodes += nodes
+        stats.backtracks += backtracks
+        stats.aborted += aborted
+    return solutions
+
+
+# ---------------------------------------------------------------------------
+# Dancing Links
+# ---------------------------------------------------------------------------
+#
+# Columns 1..324 (0 is the root header):
+#   1 + idx            cell idx is filled
+#   82 + r*9 + d-1     row r holds digit d
+#   163 + c*9 + d-1    column c holds digit d
+#   244 + b*9 + d-1    box b holds digit d
+# Matrix row k = idx*9 + d-1 places digit d at idx; its four nodes are
+# 325 + 4k .. 328 + 4k.
+
+DLX_COLUMNS = 324
+DLX_FIRST_NODE = DLX_COLUMNS + 1
+
+
+def _build_dlx_template():
+    total = DLX_FIRST_NODE + 729 * 4
+    left = list(range(total))
+    right = list(range(total))
+    up = list(range(total))
+    down = list(range(total))
+    col = list(range(total))
+    size = [0] * (DLX_COLUMNS + 1)
+    row_of = [-1] * total
+
+    for j in range(DLX_COLUMNS + 1):
+        left[j] = j - 1 if j > 0 else DLX_COLUMNS
+        right[j] = j + 1 if j < DLX_COLUMNS else 0
+
+    for idx in range(81):
+        r, c = divmod(idx, 9)
+        b = _box_of(r, c)
+        for d in range(1, 10):
+            k = idx * 9 + d - 1
+            first = DLX_FIRST_NODE + 4 * k
+            cols = (1 + idx, 82 + r * 9 + d - 1, 163 + c * 9 + d - 1, 244 + b * 9 + d - 1)
+            for i, h in enumerate(cols):
+                node = first + i
+                col[node] = h
+                row_of[node] = k
+                # append at the bottom of column h
+                up[node] = up[h]
+                down[node] = h
+                down[up[h]] = node
+                up[h] = node
+                size[h] += 1
+                left[node] = first + (i - 1) % 4
+                right[node] = first + (i + 1) % 4
+    return left, right, up, down, col, size, row_of
+
+
+_DLX_L, _DLX_R, _DLX_U, _DLX_D, _DLX_C, _DLX_S, _DLX_ROW = _build_dlx_template()
+
+
+class _DancingLinks:
+    def __init__(self) -> None:
+        self.L = _DLX_L[:]
+        self.R = _DLX_R[:]
+        self.U = _DLX_U[:]
+        self.D = _DLX_D[:]
+        self.S = _DLX_S[:]
+
+    def cover(self, c: int) -> None:
+        L, R, U, D, S, C = self.L, self.R, self.U, self.D, self.S, _DLX_C
+        R[L[c]] = R[c]
+        L[R[c]] = L[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                D[U[j]] = D[j]
+                U[D[j]] = U[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(self, c: int) -> None:
+        L, R, U, D, S, C = self.L, self.R, self.U, self.D, self.S, _DLX_C
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                D[U[j]] = j
+                U[D[j]] = j
+                j = L[j]
+            i = U[i]
+        R[L[c]] = c
+        L[R[c]] = c
+
+    def select_given(self, idx: int, d: int) -> None:
+        first = DLX_FIRST_NODE + 4 * (idx * 9 + d - 1)
+        for node in range(first, first + 4):
+            self.cover(_DLX_C[node])
+
+
+def dlx_search(
+    board: Sequence[int],
+    limit: int = 2,
+    stats: Optional[SearchStats] = None,
+    solution_out: Optional[List[int]] = None,
+    budget: Optional[SearchBudget] = None,
+) -> int:
+    """
+    Count solutions up to `limit` with Algorithm X.
+    If `solution_out` is given, it receives the first solution found.
+    """
+    if not givens_consistent(board):
+        return 0
+    links = _DancingLinks()
+    for idx, v in enumerate(board):
+        if v != 0:
+            links.select_given(idx, v)
+
+    L, R, D, S, C = links.L, links.R, links.D, links.S, _DLX_C
+    cover, uncover = links.cover, links.uncover
+    over = _budget_check(budget)
+    chosen: List[int] = []
+    solutions = 0
+    nodes = 0
+    backtracks = 0
+    aborted = False
+
+    def search() -> None:
+        nonlocal solutions, nodes, backtracks, aborted
+        if R[0] == 0:
+            solutions += 1
+            if solutions == 1 and solution_out is not None:
+                grid = list(board)
+                for k in chosen:
+                    grid[k // 9] = k % 9 + 1
+                solution_out[:] = grid
+            return
+        best = 0
+        best_size = 10
+        j = R[0]
+        while j != 0:
+            if S[j] < best_size:
+                best = j
+                best_size = S[j]
+                if best_size <= 1:
+                    break
+            j = R[j]
+        if best_size == 0:
+            backtracks += 1
+            return
+        cover(best)
+        r = D[best]
+        while r != best:
+            nodes += 1
+            if over is not None and over(nodes):
+                aborted = True
+                break
+            chosen.append(_DLX_ROW[r])
+            j = R[r]
+            while j != r:
+                cover(C[j])
+                j = R[j]
+            search()
+            j = L[r]
+            while j != r:
+                uncover(C[j])
+                j = L[j]
+            chosen.pop()
+            if solutions >= limit or aborted:
+                break
+            r = D[r]
+        uncover(best)
+
+    search()
+    if stats is not None:
+        stats.nodes += nodes
+        stats.backtracks += backtracks
+        stats.aborted += aborted
+    return solutions
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+Searcher = Callable[
+    [Sequence[int], int, Optional[SearchStats], Optional[List[int]], Optional[SearchBudget]], int
+]
+
+SEARCHERS: Dict[str, Searcher] = {
+    "bitmask": bitmask_search,
+    "dlx": dlx_search,
+    "dfs": dfs_search,
+}
+BACKENDS = tuple(SEARCHERS)
+DEFAULT_BACKEND = "bitmask"
+
+
+def _searcher(backend: str) -> Searcher:
+    try:
+        return SEARCHERS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown solver backend: {backend}") from None
+
+
+def count(
+    board: Sequence[int],
+    limit: int = 2,
+    backend: str = DEFAULT_BACKEND,
+    stats: Optional[SearchStats] = None,
+    budget: Optional[SearchBudget] = None,
+) -> int:
+    """With a budget, the count is only a lower bound once stats.aborted goes up."""
+    return _searcher(backend)(board, limit, stats, None, budget)
+
+
+def search(
+    board: Sequence[int],
+    limit: int = 2,
+    backend: str = DEFAULT_BACKEND,
+    budget: Optional[SearchBudget] = None,
+) -> SearchResult:
+    """Count up to `limit` solutions and keep the first one, in one search."""
+    stats = SearchStats()
+    solution: List[int] = []
+    found = _searcher(backend)(board, limit, stats, solution, budget)
+    return SearchResult(
+        count=found,
+        solution=solution if found else None,
+        nodes=stats.nodes,
+        backtracks=stats.backtracks,
+        complete=found >= limit or not stats.aborted,
+    )
+
+
+def solve_with_stats(board: Sequence[int], backend: str = DEFAULT_BACKEND) -> Tuple[Optional[List[int]], SearchStats]:
+    result = search(board, limit=1, backend=backend)
+    return result.solution, SearchStats(nodes=result.nodes, backtracks=result.backtracks)
+
+
+def solve(board: Sequence[int], backend: str = DEFAULT_BACKEND) -> Optional[List[int]]:
+    return solve_with_stats(board, backend=backend)[0]
+
+
+def is_unique(board: Sequence[int], backend: str = DEFAULT_BACKEND) -> bool:
+    return count(board, limit=2, backend=backend) == 1
+
+
+def uniqueness_of(found: int, aborted: bool) -> str:
+    """Map a limit-2 count to UNIQUE / NOT_UNIQUE / UNKNOWN."""
+    if found >= 2:
+        return NOT_UNIQUE
+    if aborted:
+        return UNKNOWN
+    return UNIQUE if found == 1 else NOT_UNIQUE
+
+
+def uniqueness(
+    board: Sequence[int],
+    backend: str = DEFAULT_BACKEND,
+    budget: Optional[SearchBudget] = None,
+) -> str:
+    """Three-state uniqueness check; UNKNOWN only when the budget ran out first."""
+    stats = SearchStats()
+    found = _searcher(backend)(board, 2, stats, None, budget)
+    return uniqueness_of(found, bool(stats.aborted))
+
+
+def parse_puzzle(text: str) -> List[int]:
+    text = text.strip()
+    if len(text) != 81:
+        raise ValueError("puzzle must be 81 characters")
+    out: List[int] = []
+    for ch in text:
+        if ch in ("0", "."):
+            out.append(0)
+        elif "1" <= ch <= "9":
+            out.append(int(ch))
+        else:
+            raise ValueError(f"invalid character: {ch}")
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Count and solve a Sudoku puzzle with the shared solver.")
+    parser.add_argument("puzzle", help="81 characters, 0 or . for blanks")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS)
+    parser.add_argument("--limit", type=int, default=2, help="Stop counting at this many solutions.")
+    parser.add_argument("--max-nodes", type=int, default=0, help="Search node budget (0 = unlimited).")
+    parser.add_argument("--max-seconds", type=float, default=0.0, help="Wall-clock budget (0 = unlimited).")
+    args = parser.parse_args()
+
+    budget = SearchBudget(max_nodes=args.max_nodes, max_seconds=args.max_seconds)
+    result = search(parse_puzzle(args.puzzle), limit=args.limit, backend=args.backend, budget=budget)
+    if not result.complete:
+        print("budget exhausted: counts below are a lower bound")
+    print(f"solutions: {result.count}{'+' if result.count >= args.limit else ''}")
+    print(f"unique: {result.count == 1}")
+    print(f"nodes: {result.nodes}")
+    print(f"backtracks: {result.backtracks}")
+    if result.solution is not None:
+        print(f"solution: {''.join(map(str, result.solution))}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
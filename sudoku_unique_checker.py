@@ -15,7 +15,9 @@ puzzle.txt 格式（9 行，每行 9 個字元）：
 from __future__ import annotations
 
 import sys
-from typing import List, Tuple
+from typing import List
+
+from sudoku_solver import is_unique
 
 Grid = List[List[int]]
 
@@ -40,82 +42,12 @@ def parse_grid(lines: List[str]) -> Grid:
     return grid
 
 
-def is_valid_move(grid: Grid, r: int, c: int, n: int) -> bool:
-    if any(grid[r][j] == n for j in range(9)):
-        return False
-    if any(grid[i][c] == n for i in range(9)):
-        return False
-    br, bc = (r // 3) * 3, (c // 3) * 3
-    for i in range(br, br + 3):
-        for j in range(bc, bc + 3):
-            if grid[i][j] == n:
-                return False
-    return True
-
-
-def find_best_empty_cell(grid: Grid) -> Tuple[int, int, List[int]] | None:
-    """
-    找候選數最少的空格（MRV），加速搜尋。
-    回傳 (row, col, candidates)；若無空格回傳 None。
-    """
-    best = None
-    best_candidates: List[int] = []
-    for r in range(9):
-        for c in range(9):
-            if grid[r][c] != 0:
-                continue
-            candidates = [n for n in range(1, 10) if is_valid_move(grid, r, c, n)]
-            if not candidates:
-                return (r, c, [])
-            if best is None or len(candidates) < len(best_candidates):
-                best = (r, c)
-                best_candidates = candidates
-                if len(best_candidates) == 1:
-                    return (r, c, best_candidates)
-    if best is None:
-        return None
-    return (best[0], best[1], best_candidates)
-
-
 def has_unique_solution(grid: Grid) -> bool:
     """
     回傳 True 代表唯一解，False 代表無解或多解。
+    搜尋交給共用求解器 sudoku_solver（已填數字互相衝突時視為無解）。
     """
-    solutions = 0
-
-    def dfs() -> None:
-        nonlocal solutions
-        if solutions >= 2:
-            return
-        next_cell = find_best_empty_cell(grid)
-        if next_cell is None:
-            solutions += 1
-            return
-
-        r, c, candidates = next_cell
-        if not candidates:
-            return
-
-        for n in candidates:
-            grid[r][c] = n
-            dfs()
-            grid[r][c] = 0
-
-    # 先檢查已填數字是否互相衝突
-    original = [row[:] for row in grid]
-    for r in range(9):
-        for c in range(9):
-            v = original[r][c]
-            if v == 0:
-                continue
-            grid[r][c] = 0
-            if not is_valid_move(grid, r, c, v):
-                grid[r][c] = v
-                return False
-            grid[r][c] = v
-
-    dfs()
-    return solutions == 1
+    return is_unique([v for row in grid for v in row])
 
 
 def main() -> int:
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of solution counts, shared by generator runs (SQLite, WAL).
+Off unless a run passes --unique-cache: every dig-probe miss costs a
+SELECT and an INSERT, and fresh random grids seldom repeat across runs, so
+it mostly pays off for re-runs over the same inputs.
+
+UniqueCounterCache in generate_and_filter_nirvana.py keeps its per-run
+dict in front of this store, so every batch subprocess and every later run
+starts from what earlier runs already counted. Keys are puzzle_key()
+strings; a minlex key is itself a puzzle with the same count, so raw and
+canonical keys can share one file.
+
+Each entry holds min(count, cap) and the cap it was searched with: counts
+below the cap are exact and answer any limit, a capped count answers
+limits up to its cap. Budget-aborted (unknown) counts are never stored.
+
+Every run appends its hit/miss numbers to a `runs` table, so the batch
+report can show hit rates across runs.
+
+Pre-warm from existing levels and earlier pools:
+  python unique_cache.py --prewarm levels.js out_nirvana_batch/runs/*/nirvana_stage1_pool.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+from nirvana_filter import DEFAULT_BACKEND, count_solutions, load_levels
+from sudoku_canon import puzzle_key
+
+
+DEFAULT_UNIQUE_CACHE_PATH = Path(".cache/solution_counts.sqlite")
+
+
+class UniqueCountStore:
+    def __init__(self, path: Path, commit_every: int = 500) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS solution_counts (key TEXT PRIMARY KEY, count INTEGER, cap INTEGER)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "label TEXT, finished REAL, hits INTEGER, misses INTEGER, stored INTEGER)"
+        )
+        self._conn.commit()
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self._pending = 0
+
+    def get(self, key: str, limit: int = 2) -> Optional[int]:
+        """Solution count capped at `limit`, or None if no stored entry can answer it."""
+        row = self._conn.execute("SELECT count, cap FROM solution_counts WHERE key = ?", (key,)).fetchone()
+        if row is not None and (row[0] < row[1] or row[1] >= limit):
+            self.hits += 1
+            return min(row[0], limit)
+        self.misses += 1
+        return None
+
+    def put(self, key: str, count: int, limit: int) -> None:
+        # A concurrent run may have stored the same key; keep the higher cap.
+        self._conn.execute(
+            "INSERT INTO solution_counts VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET count = excluded.count, cap = excluded.cap "
+            "WHERE excluded.cap > solution_counts.cap",
+            (key, min(count, limit), limit),
+        )
+        self.stored += 1
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+
+    def commit(self) -> None:
+        self._conn.commit()
+        self._pending = 0
+
+    def record_run(self, label: str) -> None:
+        """Append this process's hit/miss numbers to the runs table."""
+        self._conn.execute(
+            "INSERT INTO runs VALUES (?, ?, ?, ?, ?)",
+            (label, time.time(), self.hits, self.misses, self.stored),
+        )
+        self.commit()
+
+    def run_stats(self, labels: Sequence[str]) -> List[tuple]:
+        """(label, hits, misses, stored) of the latest recorded run for each label, in order."""
+        out = []
+        for label in labels:
+            row = self._conn.execute(
+                "SELECT label, hits, misses, stored FROM runs WHERE label = ? ORDER BY finished DESC LIMIT 1",
+                (label,),
+            ).fetchone()
+            if row is not None:
+                out.append(row)
+        return out
+
+    def run_totals(self) -> tuple:
+        """(runs, hits, misses) summed over every recorded run."""
+        runs, hits, misses = self._conn.execute("SELECT COUNT(*), SUM(hits), SUM(misses) FROM runs").fetchone()
+        return runs, hits or 0, misses or 0
+
+    def close(self) -> None:
+        self.commit()
+        self._conn.close()
+
+    def __contains__(self, key: str) -> bool:
+        """True if the entry answers the usual limit=2 check (does not touch hit counters)."""
+        row = self._conn.execute("SELECT count, cap FROM solution_counts WHERE key = ?", (key,)).fetchone()
+        return row is not None and (row[0] < row[1] or row[1] >= 2)
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM solution_counts").fetchone()[0]
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"hits={self.hits} misses={self.misses} hit_rate={rate:.1%} stored={self.stored}"
+
+
+def prewarm(
+    store: UniqueCountStore,
+    puzzles: Iterable[Sequence[int]],
+    backend: str = DEFAULT_BACKEND,
+    canonical: bool = False,
+) -> int:
+    """Count and store every puzzle the store cannot answer yet; returns how many were added."""
+    added = 0
+    for puzzle in puzzles:
+        key = puzzle_key(puzzle, canonical)
+        if key in store:
+            continue
+        store.put(key, count_solutions(puzzle, limit=2, backend=backend), 2)
+        added += 1
+    store.commit()
+    return added
+
+
+def level_puzzles(paths: Iterable[Path]) -> List[List[int]]:
+    """Puzzles of every levels.js / levels / pool file that exists."""
+    out: List[List[int]] = []
+    for path in paths:
+        if path.exists():
+            out.extend(lv["puzzle"] for lv in load_levels(path) if len(lv.get("puzzle") or []) == 81)
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Inspect or pre-warm the persistent solution count cache.")
+    parser.add_argument("--path", default=str(DEFAULT_UNIQUE_CACHE_PATH))
+    parser.add_argument("--prewarm", nargs="*", default=[], help="levels.js / level or pool .json files.")
+    parser.add_argument("--canonical", action="store_true", help="Store minlex keys.")
+    args = parser.parse_args()
+
+    path = Path(args.path)
+    if not path.exists() and not args.prewarm:
+        print(f"{path}: no cache yet")
+        return 0
+    store = UniqueCountStore(path)
+    if args.prewarm:
+        added = prewarm(store, level_puzzles(Path(p) for p in args.prewarm), canonical=args.canonical)
+        print(f"pre-warmed: {added} new entries ({store.summary()})")
+    runs, hits, misses = store.run_totals()
+    print(f"{path}: {len(store)} entries, {runs} recorded runs")
+    if hits + misses:
+        print(f"all runs: hits={hits} misses={misses} hit_rate={hits / (hits + misses):.1%}")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())